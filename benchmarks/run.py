@@ -0,0 +1,315 @@
+"""Offline benchmark of the bot commands.
+
+Loads every cog into a bot that never connects, with a fake guild, fake members and yfinance replaced by
+benchmarks.stubs.FakeYFinance, then drives each command and reports per command:
+    p50/p99/max latency, throughput, bytes written to disk (/proc/self/io) and time the event loop was blocked.
+
+Storage goes to a temporary directory, nothing in storage/ is touched.
+
+Examples:
+    python -m benchmarks.run
+    python -m benchmarks.run --users 500 --concurrency 32 --iterations 1000 --only currency
+    python -m benchmarks.run --backend json --yf-latency 0.2 --json results.json
+
+Note:
+    Commands are invoked through their callbacks, checks and cooldowns (is_owner, $beg once an hour) don't apply.
+    Bytes written cover this process only, the chart rendering processes aren't counted.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import constants
+from util.storage import close_storage
+from benchmarks.stubs import BenchBot, FakeContext, FakeGuild, FakeYFinance
+
+COGS = ("currency", "prediction_game", "stock_tickers", "time_converter", "reaction_roles", "tools", "dev")
+
+
+class Scenario():
+    """
+        One command to drive.
+
+        Args:
+            cog: name of the cog the command belongs to
+            command: qualified command name (e.g. "tz of"), or the name of a listener method on the cog
+            args: callable (harness, member, i) -> (args, kwargs) for the callback
+            channel: name of the fake channel to invoke it in
+            iterations/concurrency: override the command line for commands that can't run often
+            label: name in the results instead of the command's, for a second scenario of the same command
+    """
+    def __init__(self, cog: str, command: str, args=None, channel: str = "general", listener: bool = False,
+                 iterations: int = None, concurrency: int = None, label: str = None):
+        self.cog = cog
+        self.command = command
+        self.args = args or (lambda harness, member, i: ((), {}))
+        self.channel = channel
+        self.listener = listener
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.label = label or command
+
+    @property
+    def name(self) -> str:
+        return f"{self.cog}.{self.label}"
+
+
+def _positional(*args):
+    return lambda harness, member, i: (args, {})
+
+
+SCENARIOS = [
+    Scenario("Currency", "$bal"),
+    Scenario("Currency", "$beg"),
+    Scenario("Currency", "$send", lambda h, m, i: ((h.other_member(m), "1"), {})),
+    Scenario("Currency", "$slots", _positional("10")),
+    Scenario("Currency", "$buy", lambda h, m, i: ((1,), {"item": "mayo"})),
+    Scenario("Currency", "$sell", lambda h, m, i: ((1,), {"item": "mayo"})),
+    Scenario("Currency", "$inv"),
+    Scenario("Currency", "$shop"),
+    Scenario("Currency", "$lead", _positional(10)),
+    Scenario("PredictionGame", "predict",
+             lambda h, m, i: ((round(40 + (i % 200) * 0.05, 2),), {"method": f"m{i % 3}"}), channel="xanastrology"),
+    Scenario("PredictionGame", "pred-status", _positional(1), channel="xanastrology"),
+    Scenario("PredictionGame", "plb", _positional(10), channel="xanastrology"),
+    Scenario("PredictionGame", "check-results", channel="xanastrology", iterations=1, concurrency=1),
+    Scenario("StockTickers", "ticker-close", lambda h, m, i: ((h.symbol(i),), {})),
+    Scenario("StockTickers", "ticker-open", lambda h, m, i: ((h.symbol(i),), {})),
+    Scenario("StockTickers", "quote", lambda h, m, i: ((h.symbol(i), h.symbol(i + 1), h.symbol(i + 2)), {})),
+    Scenario("StockTickers", "graph", lambda h, m, i: ((h.symbol(i), "5d", "1h"), {})),
+    Scenario("StockTickers", "graph", lambda h, m, i: ((f"{h.symbol(i)},{h.symbol(i + 1)}", "5d", "1h"), {}),
+             label="graph a,b"),
+    Scenario("StockTickers", "ticker-options", lambda h, m, i: ((h.symbol(i),), {})),
+    Scenario("StockTickers", "ticker-info", lambda h, m, i: ((h.symbol(i),), {})),
+    Scenario("TimeConverter", "tz", lambda h, m, i: (("cet",), {})),
+    Scenario("TimeConverter", "tz of", lambda h, m, i: ((h.other_member(m),), {})),
+    Scenario("TimeConverter", "tz convert", lambda h, m, i: (("now", h.other_member(m)), {})),
+    Scenario("TimeConverter", "tz world"),
+    Scenario("ReactionRoles", "on_raw_reaction_add", lambda h, m, i: ((h.rules_reaction(m),), {}), listener=True),
+    Scenario("Tools", "ping"),
+    Scenario("Tools", "info"),
+    Scenario("Dev", "member-list", iterations=5, concurrency=1),
+    Scenario("Dev", "clear"),
+]
+
+
+def read_io() -> dict:
+    """Counters of /proc/self/io, empty where there is no procfs."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            return {key: int(value) for key, value in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+
+class LoopMonitor():
+    """Sleeps interval over and over, whatever it oversleeps by more than threshold the loop was blocked for."""
+
+    def __init__(self, interval: float = 0.001, threshold: float = 0.002):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked = 0.0
+        self.longest = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            late = loop.time() - start - self.interval
+            if late > self.threshold:
+                self.blocked += late
+                self.longest = max(self.longest, late)
+
+    def start(self):
+        self.blocked = 0.0
+        self.longest = 0.0
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+
+class Harness():
+    def __init__(self, bot: BenchBot, users: int, symbols: list):
+        self.bot = bot
+        self.guild = bot.guild
+        self.members = [self.guild.add_member(f"member{i}") for i in range(users)]
+        self.symbols = symbols
+        self.channels = {
+            "general": self.guild.add_channel("general"),
+            "xanastrology": self.guild.add_channel("xanastrology", constants.ChannelIDs.XANASTROLOGY),
+            "vegas": self.guild.add_channel("vegas", constants.ChannelIDs.VEGAS),
+        }
+
+    def other_member(self, member):
+        return self.members[(self.members.index(member) + 1) % len(self.members)]
+
+    def symbol(self, i: int) -> str:
+        return self.symbols[i % len(self.symbols)]
+
+    def rules_reaction(self, member):
+        return SimpleNamespace(message_id=constants.MessageIDs.RULES_MSGID, guild_id=self.guild.id, member=member,
+                               user_id=member.id, emoji="✅")
+
+    async def seed(self):
+        """Money to play with for everybody and the roles the cogs look for."""
+        currency = self.bot.get_cog("Currency")
+        for member in self.members:
+            currency.ledger.update_wallet(member.id, 1_000_000, "benchmark")
+        await currency.ledger.flush()
+
+        await self.guild.create_role("Not Verified")
+        self.bot.get_cog("PredictionGame").submissions_open = True
+
+    def resolve(self, scenario: Scenario):
+        cog = self.bot.get_cog(scenario.cog)
+        if scenario.listener:
+            return getattr(cog, scenario.command)
+
+        command = self.bot.get_command(scenario.command)
+        return lambda ctx, *args, **kwargs: command.callback(cog, ctx, *args, **kwargs)
+
+    async def run(self, scenario: Scenario, iterations: int, concurrency: int) -> dict:
+        iterations = scenario.iterations or iterations
+        concurrency = scenario.concurrency or concurrency
+        call = self.resolve(scenario)
+        channel = self.channels[scenario.channel]
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = []
+
+        async def one(i):
+            member = self.members[i % len(self.members)]
+            args, kwargs = scenario.args(self, member, i)
+            target = args[0] if scenario.listener else FakeContext(self.bot, member, channel)
+            call_args = args[1:] if scenario.listener else args
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await call(target, *call_args, **kwargs)
+                except Exception as e:
+                    errors.append(repr(e))
+                latencies.append(time.perf_counter() - start)
+
+        monitor = LoopMonitor()
+        io_before = read_io()
+        monitor.start()
+        start = time.perf_counter()
+
+        await asyncio.gather(*(one(i) for i in range(iterations)))
+        # Count the write-behind bank flush to the command that caused it
+        await self.bot.get_cog("Currency").ledger.flush()
+
+        elapsed = time.perf_counter() - start
+        monitor.stop()
+        io_after = read_io()
+
+        latencies = np.array(latencies) * 1000
+        return {
+            "command": scenario.name,
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "ops_per_s": iterations / elapsed,
+            "write_bytes": io_after.get("write_bytes", 0) - io_before.get("write_bytes", 0),
+            "wchar": io_after.get("wchar", 0) - io_before.get("wchar", 0),
+            "loop_blocked_ms": monitor.blocked * 1000,
+            "longest_block_ms": monitor.longest * 1000,
+        }
+
+
+def print_table(results: list):
+    header = f"{'command':<36}{'n':>6}{'err':>5}{'p50 ms':>10}{'p99 ms':>10}{'ops/s':>10}" \
+             f"{'disk B':>11}{'wchar B':>11}{'blocked ms':>12}{'max blk':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['command']:<36}{r['iterations']:>6}{r['errors']:>5}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['ops_per_s']:>10.1f}{r['write_bytes']:>11}{r['wchar']:>11}{r['loop_blocked_ms']:>12.1f}"
+              f"{r['longest_block_ms']:>9.1f}")
+    for r in results:
+        if r["first_error"]:
+            print(f"{r['command']}: {r['errors']} errors, first: {r['first_error']}")
+
+
+async def bench(bot: BenchBot, args) -> list:
+    harness = Harness(bot, args.users, args.symbols.split(","))
+    for cog in COGS:
+        bot.load_extension(f"cogs.{cog}")
+    await harness.seed()
+
+    results = []
+    try:
+        # Some commands print (ReactionRoles, ticker-options), keep the writes but not the noise
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for scenario in SCENARIOS:
+                if args.only and args.only.lower() not in scenario.name.lower():
+                    continue
+                results.append(await harness.run(scenario, args.iterations, args.concurrency))
+    finally:
+        for cog in COGS:
+            bot.unload_extension(f"cogs.{cog}")
+        # What the bot does on shutdown, with the json backend this compacts the bank journal
+        close_storage()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot commands offline")
+    parser.add_argument("--users", type=int, default=50, help="fake members invoking the commands")
+    parser.add_argument("--iterations", type=int, default=200, help="invocations per command")
+    parser.add_argument("--concurrency", type=int, default=8, help="invocations in flight at once")
+    parser.add_argument("--backend", choices=("sqlite", "json"), default=constants.Storage.BACKEND)
+    parser.add_argument("--yf-latency", type=float, default=0.05, help="seconds every fake yahoo request takes")
+    parser.add_argument("--symbols", default="gme,amc,bb,nok,spy", help="symbols the ticker commands cycle through")
+    parser.add_argument("--only", help="only commands whose cog.command name contains this")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    root = os.path.abspath(os.getcwd())
+    workdir = tempfile.mkdtemp(prefix="discord_bot_bench_")
+    try:
+        # Everything the cogs write lands in the temporary directory, Tools.info wants its icon in the cwd
+        os.makedirs(f"{workdir}{os.sep}storage")
+        shutil.copy(f"{root}{os.sep}images{os.sep}ssq_icon.png", workdir)
+        constants.FilePaths.ROOT_PATH = workdir
+        constants.FilePaths.COGS_PATH = f"{root}{os.sep}cogs"
+        constants.FilePaths.STORAGE_PATH = f"{workdir}{os.sep}storage"
+        constants.FilePaths.IMAGES_PATH = f"{root}{os.sep}images"
+        constants.FilePaths.CONFIG_PATH = f"{root}{os.sep}config"
+        constants.Storage.BACKEND = args.backend
+        os.chdir(workdir)
+
+        import util.market_data
+        util.market_data.yf = FakeYFinance(args.yf_latency)
+
+        bot = BenchBot(FakeGuild())
+        results = bot.loop.run_until_complete(bench(bot, args))
+    finally:
+        os.chdir(root)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Stand-ins for the discord objects and yfinance, enough to drive the cogs without any network access."""
+import asyncio
+import hashlib
+import itertools
+import time
+from collections import namedtuple
+
+import discord
+import numpy as np
+import pandas as pd
+from discord.ext import commands
+
+_ids = itertools.count(10 ** 17)
+
+
+class FakeRole():
+    def __init__(self, name: str, guild):
+        self.id = next(_ids)
+        self.name = name
+        self.guild = guild
+        self.members = []
+
+    def __str__(self):
+        return self.name
+
+
+class FakeMember():
+    def __init__(self, name: str, guild, user_id: int = None):
+        self.id = user_id or next(_ids)
+        self.name = name
+        self.display_name = name
+        self.guild = guild
+        self.roles = []
+        self.bot = False
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def __str__(self):
+        return f"{self.name}#0001"
+
+    async def add_roles(self, *roles):
+        for role in roles:
+            if role not in self.roles:
+                self.roles.append(role)
+                role.members.append(self)
+
+    async def remove_roles(self, *roles):
+        for role in roles:
+            if role in self.roles:
+                self.roles.remove(role)
+                role.members.remove(self)
+
+
+class FakeMessage():
+    def __init__(self, channel, content=None, embed=None, file=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.file = file
+        self.reactions = []
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(emoji)
+
+    async def remove_reaction(self, emoji, member):
+        pass
+
+    async def clear_reactions(self):
+        self.reactions = []
+
+    async def edit(self, content=None, embed=None):
+        self.content = content if content is not None else self.content
+        self.embed = embed if embed is not None else self.embed
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def delete(self, delay=None):
+        pass
+
+
+class FakeChannel():
+    """Keeps the number of messages and the bytes of what was sent, nothing else."""
+
+    def __init__(self, name: str, guild, channel_id: int = None):
+        self.id = channel_id or next(_ids)
+        self.name = name
+        self.guild = guild
+        self.sent = 0
+        self.sent_bytes = 0
+
+    @property
+    def mention(self) -> str:
+        return f"<#{self.id}>"
+
+    async def send(self, content=None, *, embed=None, file=None, delete_after=None, **kwargs):
+        self.sent += 1
+        if content is not None:
+            self.sent_bytes += len(str(content))
+        if embed is not None:
+            self.sent_bytes += len(embed)
+        if file is not None:
+            self.sent_bytes += len(file.fp.read())
+            file.close()
+        return FakeMessage(self, content, embed, file)
+
+    async def purge(self, limit=100):
+        return []
+
+
+class FakeGuild():
+    def __init__(self, name: str = "Superstonk Quants"):
+        self.id = next(_ids)
+        self.name = name
+        self.roles = []
+        self.members = []
+        self.channels = []
+
+    def add_member(self, name: str, user_id: int = None) -> FakeMember:
+        member = FakeMember(name, self, user_id)
+        self.members.append(member)
+        return member
+
+    def add_channel(self, name: str, channel_id: int = None) -> FakeChannel:
+        channel = FakeChannel(name, self, channel_id)
+        self.channels.append(channel)
+        return channel
+
+    def get_member(self, user_id):
+        return next((member for member in self.members if member.id == user_id), None)
+
+    async def create_role(self, name: str, **kwargs) -> FakeRole:
+        role = FakeRole(name, self)
+        self.roles.append(role)
+        return role
+
+    async def fetch_members(self, limit=None):
+        for member in self.members[:limit]:
+            yield member
+
+
+class FakeContext():
+    """What a command callback gets as ctx."""
+
+    def __init__(self, bot, author: FakeMember, channel: FakeChannel):
+        self.bot = bot
+        self.author = author
+        self.guild = author.guild
+        self.channel = channel
+        self.message = FakeMessage(channel)
+        self.command = None
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class BenchBot(commands.Bot):
+    """
+        A commands.Bot that never connects. Users, channels and guilds come from the fake guild,
+        wait_until_ready never returns, so the cogs' background loops stay parked.
+    """
+    def __init__(self, guild: FakeGuild, **kwargs):
+        super().__init__(command_prefix="!", intents=discord.Intents.all(), **kwargs)
+        self.guild = guild
+
+    @property
+    def guilds(self):
+        return [self.guild]
+
+    @property
+    def latency(self):
+        return 0.0
+
+    def get_guild(self, guild_id):
+        return self.guild if guild_id == self.guild.id else None
+
+    def get_channel(self, channel_id):
+        return next((channel for channel in self.guild.channels if channel.id == channel_id), None)
+
+    def get_user(self, user_id):
+        return self.guild.get_member(user_id)
+
+    async def wait_until_ready(self):
+        await asyncio.Event().wait()
+
+
+# Trading days and bar length in minutes, roughly what yahoo hands out
+_PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260, "10y": 2520,
+                "ytd": 200, "max": 5000}
+_INTERVAL_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60,
+                     "1d": 390, "5d": 1950, "1wk": 1950, "1mo": 8190, "3mo": 24570}
+
+_LAST_SESSION = pd.Timestamp("2026-10-16 20:00", tz="America/New_York")
+
+OptionChain = namedtuple("OptionChain", ["calls", "puts"])
+
+
+def _rng(*key) -> np.random.Generator:
+    return np.random.default_rng(int.from_bytes(hashlib.md5(repr(key).encode()).digest()[:8], "little"))
+
+
+class FakeYFinance():
+    """
+        Replaces the yfinance module inside util.market_data. Prices are a random walk seeded by the symbol,
+        the same request always gets the same data. latency is slept on the calling (worker) thread.
+    """
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.requests = 0
+
+    def _wait(self):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def history(symbol: str, period: str = "1mo", interval: str = "1d", prepost: bool = True,
+                start=None) -> pd.DataFrame:
+        minutes = _INTERVAL_MINUTES.get(interval, 390)
+        day_minutes = 960 if prepost and minutes < 390 else 390
+        days = _PERIOD_DAYS.get(period, 21) if start is None else len(pd.bdate_range(start, _LAST_SESSION.date()))
+        bars = max(1, days * day_minutes // minutes)
+
+        rng = _rng(symbol.upper(), period, interval)
+        close = 40 * np.exp(np.cumsum(rng.normal(0, 0.002 * np.sqrt(minutes), bars)))
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        spread = np.abs(rng.normal(0, 0.001 * np.sqrt(minutes), bars)) * close
+        index = pd.date_range(end=_LAST_SESSION, periods=bars, freq=f"{minutes}min")
+        return pd.DataFrame({
+            "Open": open_,
+            "High": np.maximum(open_, close) + spread,
+            "Low": np.minimum(open_, close) - spread,
+            "Close": close,
+            "Volume": rng.integers(1_000, 1_000_000, bars),
+        }, index=index)
+
+    def download(self, tickers, start=None, end=None, threads=True, group_by="column", auto_adjust=True,
+                 progress=True, period="1mo", interval="1d", prepost=False):
+        # Only arguments the installed yfinance takes as well, a call that would fail there fails here too
+        self._wait()
+        symbols = tickers.replace(",", " ").split() if isinstance(tickers, str) else list(tickers)
+        if len(symbols) == 1:
+            return self.history(symbols[0], period, interval, prepost, start)
+
+        frames = {symbol.upper(): self.history(symbol, period, interval, prepost, start) for symbol in symbols}
+        data = pd.concat(frames, axis=1)
+        # yahoo puts the field on top with group_by='column'
+        return data.swaplevel(axis=1).sort_index(axis=1) if group_by == "column" else data
+
+    def Ticker(self, symbol: str):
+        return FakeTicker(self, symbol)
+
+
+class FakeTicker():
+    def __init__(self, yf: FakeYFinance, symbol: str):
+        self.yf = yf
+        self.symbol = symbol.upper()
+
+    @property
+    def options(self) -> tuple:
+        self.yf._wait()
+        fridays = pd.date_range("2026-10-23", periods=16, freq="W-FRI")
+        return tuple(day.strftime("%Y-%m-%d") for day in fridays)
+
+    def option_chain(self, expiry: str) -> OptionChain:
+        self.yf._wait()
+        rng = _rng(self.symbol, expiry)
+        strikes = np.arange(5.0, 200.0, 2.5)
+
+        def side(kind):
+            return pd.DataFrame({
+                "contractSymbol": [f"{self.symbol}{expiry}{kind}{strike:08.3f}" for strike in strikes],
+                "strike": strikes,
+                "lastPrice": rng.uniform(0.01, 30, len(strikes)),
+                "bid": rng.uniform(0.01, 30, len(strikes)),
+                "ask": rng.uniform(0.01, 30, len(strikes)),
+                "volume": rng.integers(0, 10_000, len(strikes)),
+                "openInterest": rng.integers(0, 50_000, len(strikes)),
+                "impliedVolatility": rng.uniform(0.2, 3.0, len(strikes)),
+                "inTheMoney": rng.random(len(strikes)) > 0.5,
+            })
+
+        return OptionChain(side("C"), side("P"))
+
+    @property
+    def info(self) -> dict:
+        self.yf._wait()
+        rng = _rng(self.symbol, "info")
+        # yahoo sends a couple hundred keys, most of them never looked at
+        info = {f"field{i}": float(value) for i, value in enumerate(rng.random(150))}
+        info.update({
+            "symbol": self.symbol,
+            "shortName": f"{self.symbol} Inc.",
+            "longName": f"{self.symbol} Incorporated",
+            "sector": "Consumer Cyclical",
+            "industry": "Specialty Retail",
+            "marketCap": int(rng.integers(10 ** 8, 10 ** 11)),
+            "sharesOutstanding": int(rng.integers(10 ** 7, 10 ** 9)),
+            "floatShares": int(rng.integers(10 ** 7, 10 ** 9)),
+            "shortPercentOfFloat": float(rng.random()),
+            "trailingPE": float(rng.uniform(-50, 80)),
+            "fiftyTwoWeekHigh": float(rng.uniform(40, 100)),
+            "fiftyTwoWeekLow": float(rng.uniform(5, 40)),
+            "longBusinessSummary": "Lorem ipsum " * 200,
+        })
+        return info
@@ -9,6 +9,7 @@ from discord.ext import commands, tasks
 from discord.ext.commands import Bot
 
 import constants
+from util.storage import close_storage
 
 # Declare all intents
 intents = Intents().all()
@@ -21,6 +22,7 @@ constants.FilePaths.ROOT_PATH = os.path.abspath(os.getcwd())
 constants.FilePaths.COGS_PATH = f"{constants.FilePaths.ROOT_PATH}{os.sep}cogs"
 constants.FilePaths.STORAGE_PATH = f"{constants.FilePaths.ROOT_PATH}{os.sep}storage"
 constants.FilePaths.IMAGES_PATH = f"{constants.FilePaths.ROOT_PATH}{os.sep}images"
+constants.FilePaths.CONFIG_PATH = f"{constants.FilePaths.ROOT_PATH}{os.sep}config"
 
 # Setup logging to console and file
 # Documentation: https://docs.python.org/3/howto/logging.html#logging-basic-tutorial
@@ -54,7 +56,14 @@ def get_prefix(bot, message):
     return ['!', '?', '>']
 
 
-bot = Bot(
+class QuantBot(Bot):
+    async def close(self):
+        """Unloads the cogs (the Currency ledger flushes on unload), then closes the storage they share."""
+        await super().close()
+        close_storage()
+
+
+bot = QuantBot(
     command_prefix=get_prefix,
     description='SuperstonkQuantBot Commands',
     intents=intents,
@@ -1,16 +1,13 @@
-import json
-import random
 import os
+import random
 import constants
 import discord
 from discord.ext import commands
-
-mainshop = [
-    {"name": "Jar of Mayo", "price": 100, "description": "Yes, mayo."},
-    {"name": "Bananas", "price": 100, "description": "Yummy"},
-    {"name": "Diamond", "price": 10000, "description": "shiny"},
-    {"name": "Lambo", "price": 99999, "description": "Lambo go VRRRROOM"}
-]
+from util.ledger import BankLedger, InsufficientFunds, InsufficientItems
+from util.messages import Paginator
+from util.shop import ShopCatalog
+from util.slots import SlotMachine
+from util.storage import get_storage
 
 
 class Currency(commands.Cog):
@@ -21,6 +18,14 @@ class Currency(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.ledger = BankLedger(get_storage())
+        # Items for sale, edit config/shop.json to change them
+        self.shop = ShopCatalog.load(f"{constants.FilePaths.CONFIG_PATH}{os.sep}shop.json")
+        self.slot_machine = SlotMachine(seed=constants.Slots.SEED)
+
+    def cog_unload(self):
+        # Make sure nothing that is still waiting for the write-behind flush gets lost
+        self.ledger.close()
 
     @commands.command(
         name="$bal",
@@ -28,12 +33,9 @@ class Currency(commands.Cog):
         brief="Bank account balance"
     )
     async def bal(self, ctx):
-        await self.open_account(ctx.author)
         user = ctx.author
 
-        users = await self.get_bank_data()
-
-        wallet_amt = users[str(user.id)]["wallet"]
+        wallet_amt = self.ledger.get_balance(user.id)
 
         em = discord.Embed(title=f"{user.name}'s Balance", color=discord.Color.red())
         em.add_field(name="\u200b", value=f"${wallet_amt}")
@@ -47,19 +49,13 @@ class Currency(commands.Cog):
     @commands.cooldown(1, 3600, commands.BucketType.user)
     async def beg(self, ctx):
 
-        await self.open_account(ctx.author)
         user = ctx.author
 
-        users = await self.get_bank_data()
-
         earnings = random.randrange(101)
 
         await ctx.send(f'{ctx.author.mention} Got ${earnings}!!')
 
-        users[str(user.id)]["wallet"] += earnings
-
-        with open(f"{constants.FilePaths.STORAGE_PATH}{os.sep}bank.json", 'w') as f:
-            json.dump(users, f, indent=4)
+        self.ledger.update_wallet(user.id, earnings, "beg")
 
     @commands.command(
         name="$send",
@@ -71,27 +67,24 @@ class Currency(commands.Cog):
         brief="Send money"
     )
     async def send(self, ctx, member: discord.Member, amount=None):
-        await self.open_account(ctx.author)
-        await self.open_account(member)
         if amount is None:
             await ctx.send(f"{ctx.author.mention} Please enter the amount")
             return
 
-        bal = await self.update_bank(ctx.author)
-        if amount == 'all':
-            amount = bal
-
-        amount = int(amount)
+        if amount != 'all' and int(amount) < 0:
+            await ctx.send(f'{ctx.author.mention} Amount must be positive!')
+            return
 
-        if amount > bal:
+        # Debit and credit in one transaction, a concurrent command can't slip in between the two
+        try:
+            async with self.ledger.transaction(ctx.author.id, member.id, reason="send") as txn:
+                amount = txn.balance(ctx.author.id) if amount == 'all' else int(amount)
+                txn.add_wallet(ctx.author.id, -1 * amount)
+                txn.add_wallet(member.id, amount)
+        except InsufficientFunds:
             await ctx.send(f'{ctx.author.mention} You do not have sufficient balance')
             return
-        if amount < 0:
-            await ctx.send(f'{ctx.author.mention} Amount must be positive!')
-            return
 
-        await self.update_bank(ctx.author, -1 * amount)
-        await self.update_bank(member, amount)
         await ctx.send(f'{ctx.author.mention} gave {member.mention} ${amount}')
 
     @commands.command(
@@ -104,52 +97,37 @@ class Currency(commands.Cog):
     )
     @commands.cooldown(1, 30, commands.BucketType.user)
     async def slots(self, ctx, amount=None):
-        await self.open_account(ctx.author)
         if amount is None:
             await ctx.send(f"{ctx.author.mention} Please enter the amount")
             return
 
-        bal = await self.update_bank(ctx.author)
-
         amount = int(amount)
 
-        if amount > bal:
-            await ctx.send(f'{ctx.author.mention} You do not have sufficient balance')
-            return
         if amount < 0:
             await ctx.send(f'{ctx.author.mention} Amount must be positive!')
             return
 
-        slots = ['bus', 'train', 'horse', 'tiger', 'monkey', 'cow']
-        slot1 = slots[random.randint(0, 5)]
-        slot2 = slots[random.randint(0, 5)]
-        slot3 = slots[random.randint(0, 5)]
-
-        slot_output = '| :{}: | :{}: | :{}: |\n'.format(slot1, slot2, slot3)
-
-        ok = discord.Embed(title="Slots Machine", color=discord.Color(0xFFEC))
-        ok.add_field(name=f"{format(slot_output)}\nWon", value=f'{ctx.author.mention} You won ${2 * amount}')
-
-        won = discord.Embed(title="Slots Machine", color=discord.Color(0xFFEC))
-        won.add_field(name=f"{format(slot_output)}\nWon", value=f'{ctx.author.mention} You won ${4 * amount}')
+        spin = self.slot_machine.spin(amount)
 
-        lost = discord.Embed(title="Slots Machine", color=discord.Color(0xFFEC))
-        lost.add_field(name=f"{format(slot_output)}\nLost", value=f'{ctx.author.mention} You lost ${1 * amount}')
-
-        if slot1 == slot2 == slot3:
-            await self.update_bank(ctx.author, 4 * amount)
-            await ctx.send(embed=won)
-            return
-
-        if slot1 == slot2 or slot1 == slot3 or slot2 == slot3:
-            await self.update_bank(ctx.author, 2 * amount)
-            await ctx.send(embed=ok)
+        # The balance check and the payout happen under the same lock
+        try:
+            async with self.ledger.transaction(ctx.author.id, reason="slots") as txn:
+                if amount > txn.balance(ctx.author.id):
+                    raise InsufficientFunds(ctx.author.id, txn.balance(ctx.author.id))
+                txn.add_wallet(ctx.author.id, spin.change)
+        except InsufficientFunds:
+            await ctx.send(f'{ctx.author.mention} You do not have sufficient balance')
             return
 
+        # Only the embed that gets sent is built
+        slot_output = '| :{}: | :{}: | :{}: |\n'.format(*spin.reels)
+        result = discord.Embed(title="Slots Machine", color=discord.Color(0xFFEC))
+        if spin.won:
+            result.add_field(name=f"{slot_output}\nWon", value=f'{ctx.author.mention} You won ${spin.change}')
         else:
-            await self.update_bank(ctx.author, -1 * amount)
-            await ctx.send(embed=lost)
-            return
+            result.add_field(name=f"{slot_output}\nLost", value=f'{ctx.author.mention} You lost ${-spin.change}')
+
+        await ctx.send(embed=result)
 
     @commands.command(
         name="$yolo",
@@ -176,11 +154,8 @@ class Currency(commands.Cog):
     async def shop(self, ctx):
         em = discord.Embed(title="Shop")
 
-        for item in mainshop:
-            name = item["name"]
-            price = item["price"]
-            desc = item["description"]
-            em.add_field(name=name, value=f"${price} | {desc}")
+        for item in self.shop:
+            em.add_field(name=item.name, value=f"${item.price} | {item.description}")
 
         await ctx.send(embed=em)
 
@@ -195,14 +170,15 @@ class Currency(commands.Cog):
         brief="Buy item"
     )
     async def buy(self, ctx, amount=1, *, item):
+        if amount <= 0:
+            await ctx.send(f'{ctx.author.mention} Amount must be positive!')
+            return
+
         await self.open_account(ctx.author)
 
         res = await self.buy_this(ctx.author, item, amount)
 
         if not res[0]:
-            if res[1] == 1:
-                await ctx.send(f"{ctx.author.mention} Something went wrong and a price could not be found.")
-                return
             if res[1] == 2:
                 await ctx.send(f"{ctx.author.mention} That Object isn't there!")
                 return
@@ -210,7 +186,7 @@ class Currency(commands.Cog):
                 await ctx.send(f"{ctx.author.mention} You don't have enough money to buy {amount} {item}")
                 return
 
-        await ctx.send(f"{ctx.author.mention} You just bought {amount} {item}")
+        await ctx.send(f"{ctx.author.mention} You just bought {amount} {res[1]}")
 
     @commands.command(
         name="$inv",
@@ -218,75 +194,32 @@ class Currency(commands.Cog):
         brief="Show inventory"
     )
     async def inv(self, ctx):
-        await self.open_account(ctx.author)
         user = ctx.author
-        users = await self.get_bank_data()
-
-        try:
-            inv = users[str(user.id)]["inventory"]
-        except:
-            inv = []
+        inv = self.ledger.get_inventory(user.id)
 
         em = discord.Embed(title=f"{ctx.author.name}'s Inventory")
-        for item in inv:
-            name = item["item"]
-            amount = item["amount"]
-
-            em.add_field(name=name, value=amount)
+        for key, amount in inv.items():
+            # Items that left the shop still show up, under the name they were bought as
+            item = self.shop.get(key)
+            em.add_field(name=item.name if item else key, value=amount)
 
         await ctx.send(embed=em)
 
     async def buy_this(self, user, item_name, amount):
-        item_name = item_name.lower()
-        name_ = None
-        price = None
-        for item in mainshop:
-            name = item["name"].lower()
-            if name == item_name:
-                name_ = name
-                price = item["price"]
-                break
-
-        if price is None:
-            return [False, 1]
-
-        if name_ is None:
+        item = self.shop.find(item_name)
+        if item is None:
             return [False, 2]
 
-        cost = price * amount
-
-        users = await self.get_bank_data()
-
-        bal = await self.update_bank(user)
+        cost = item.price * amount
 
-        if bal < cost:
+        try:
+            async with self.ledger.transaction(user.id, reason="buy") as txn:
+                txn.add_wallet(user.id, -1 * cost)
+                txn.add_item(user.id, item.key, amount)
+        except InsufficientFunds:
             return [False, 3]
 
-        try:
-            index = 0
-            t = None
-            for thing in users[str(user.id)]["inventory"]:
-                n = thing["item"]
-                if n == item_name:
-                    old_amt = thing["amount"]
-                    new_amt = old_amt + amount
-                    users[str(user.id)]["inventory"][index]["amount"] = new_amt
-                    t = 1
-                    break
-                index += 1
-            if t is None:
-                obj = {"item": item_name, "amount": amount}
-                users[str(user.id)]["inventory"].append(obj)
-        except:
-            obj = {"item": item_name, "amount": amount}
-            users[str(user.id)]["inventory"] = [obj]
-
-        with open(f"{constants.FilePaths.STORAGE_PATH}{os.sep}bank.json", "w") as f:
-            json.dump(users, f, indent=4)
-
-        await self.update_bank(user, cost * -1)
-
-        return [True, "Worked"]
+        return [True, item.name]
 
     @commands.command(
         name="$sell",
@@ -299,6 +232,10 @@ class Currency(commands.Cog):
         brief="Sell item"
     )
     async def sell(self, ctx, amount=1, *, item):
+        if amount <= 0:
+            await ctx.send(f'{ctx.author.mention} Amount must be positive!')
+            return
+
         await self.open_account(ctx.author)
 
         res = await self.sell_this(ctx.author, item, amount)
@@ -314,53 +251,25 @@ class Currency(commands.Cog):
                 await ctx.send(f"{ctx.author.mention} You don't have {item} in your inventory.")
                 return
 
-        await ctx.send(f"{ctx.author.mention} You just sold {amount} {item}.")
+        await ctx.send(f"{ctx.author.mention} You just sold {amount} {res[1]}.")
 
     async def sell_this(self, user, item_name, amount, price=None):
-        item_name = item_name.lower()
-        name_ = None
-        for item in mainshop:
-            name = item["name"].lower()
-            if name == item_name:
-                name_ = name
-                if price is None:
-                    price = 0.7 * item["price"]
-                break
-
-        if name_ is None:
+        item = self.shop.find(item_name)
+        if item is None:
             return [False, 1]
 
+        if price is None:
+            price = 0.7 * item.price
         cost = price * amount
 
-        users = await self.get_bank_data()
-
-        await self.update_bank(user)
-
         try:
-            index = 0
-            t = None
-            for thing in users[str(user.id)]["inventory"]:
-                n = thing["item"]
-                if n == item_name:
-                    old_amt = thing["amount"]
-                    new_amt = old_amt - amount
-                    if new_amt < 0:
-                        return [False, 2]
-                    users[str(user.id)]["inventory"][index]["amount"] = new_amt
-                    t = 1
-                    break
-                index += 1
-            if t is None:
-                return [False, 3]
-        except discord.ext.commands.CommandError:
-            return [False, 3]
+            async with self.ledger.transaction(user.id, reason="sell") as txn:
+                txn.add_item(user.id, item.key, -1 * amount)
+                txn.add_wallet(user.id, cost)
+        except InsufficientItems as e:
+            return [False, 2] if e.owned else [False, 3]
 
-        with open(f"{constants.FilePaths.STORAGE_PATH}{os.sep}bank.json", "w") as f:
-            json.dump(users, f, indent=4)
-
-        await self.update_bank(user, cost)
-
-        return [True, "Worked"]
+        return [True, item.name]
 
     @commands.command(
         name="$lead",
@@ -368,67 +277,18 @@ class Currency(commands.Cog):
         brief="Show money leaderboard"
     )
     async def leaderboard(self, ctx, x=10):
-        users = await self.get_bank_data()
-        leader_board = {}
-        total = []
-        for user in users:
-            name = int(user)
-            total_amount = users[user]["wallet"]
-            leader_board[total_amount] = name
-            total.append(total_amount)
-
-        total = sorted(total, reverse=True)
-
-        em = discord.Embed(title=f"Top {x} Richest People",
-                           description="This is decided on the basis of money in the bank",
-                           color=discord.Color(0xfa43ee))
-        index = 1
-        for amt in total:
-            id_ = leader_board[amt]
-
-            member = self.bot.get_user(id_)
-            name = member.name
-            em.add_field(name=f"{index}. {member.mention}", value=f"{amt}", inline=False)
-            if index == x:
-                break
-            else:
-                index += 1
+        # The ledger keeps the ranking up to date, users with the same balance share a place
+        rows = (f"**{index}.** <@{user_id}> ${amt}" for index, user_id, amt in self.ledger.wealth.top(x))
 
-        await ctx.send(embed=em)
+        await Paginator(f"Top {x} Richest People", rows,
+                        header="This is decided on the basis of money in the bank", rows_per_page=10
+                        ).send(self.bot, ctx)
 
     async def open_account(self, user: discord.Member):
-
-        users = await self.get_bank_data()
-
-        if str(user.id) in users:
-            return False
-        else:
-            users[str(user.id)] = {}
-            users[str(user.id)]["wallet"] = 0
-
-        with open(f"{constants.FilePaths.STORAGE_PATH}{os.sep}bank.json", 'w') as f:
-            json.dump(users, f, indent=4)
-
-        return True
-
-    @staticmethod
-    async def get_bank_data():
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}bank.json', 'r') as f:
-            users = json.load(f)
-
-        return users
+        return self.ledger.open_account(user.id)
 
     async def update_bank(self, user: discord.Member, change=0):
-        await self.open_account(user)
-
-        users = await self.get_bank_data()
-
-        users[str(user.id)]['wallet'] += change
-
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}bank.json', 'w') as f:
-            json.dump(users, f, indent=4)
-        bal = users[str(user.id)]['wallet']
-        return bal
+        return self.ledger.update_wallet(user.id, change)
 
 
 def setup(bot):
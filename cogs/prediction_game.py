@@ -1,13 +1,16 @@
-import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import statistics
-import discord
 from discord.ext import commands, tasks
 
 import constants
-from cogs.currency import Currency
-from cogs.stock_tickers import StockTickers
+from util.leaderboard import PredictionLeaderboard
+from util.market_data import get_market_data
+from util.messages import Paginator
+from util import trading_calendar
+from util.scheduler import DailyJob, MarketScheduler
+from util.prediction_book import PredictionBook
+from util.storage import get_storage
 import logging as log
 
 
@@ -18,6 +21,7 @@ class PredictionGame(commands.Cog):
     The maximum allowed submissions per member is three.
     Submissions will be closed at market open.
     Submissions for the next day will re-open at market close + 20 minutes.
+    Nothing happens on exchange holidays, on half days the close is at 1pm EST.
 
     The prizes are outlined below:
       1st Place: Wins $1000
@@ -29,43 +33,97 @@ class PredictionGame(commands.Cog):
     """
 
     submissions_open = False
+    awaiting_results = False
     channel_id = constants.ChannelIDs.XANASTROLOGY
     mayo_emoji = "<:mayo:863563385442664478>"
 
-    def __init__(self, bot):
-        self.bot = bot
-        self.check_time.start()
+    awards = {
+        "first": 1000,
+        "second": 500,
+        "third": 100,
+        "mayo": 50
+    }
 
-    @tasks.loop(seconds=5.0)
-    async def check_time(self):
-        """This is a background task that loops every 5 seconds.
-        The coroutine looped with this task will change set the submission_open bool,
-        and update the leaderboard on open/close.
+    # Need to wait for yahoo to get proper close price so why not 420man:=)
+    results_delay = timedelta(minutes=20)
 
-        Documentation:
-            https://discordpy.readthedocs.io/en/stable/ext/tasks/index.html
-        """
-        now = datetime.now()
-        current_time = now.strftime("%H:%M:%S")  # Current time in 24 hour format HH:MM:SS
-        current_day = now.weekday()  # Current day as int (0=monday to 6=sunday)
+    # !pred-status shows the predictions nearest to the price first, in pages of status_page_size
+    status_page_size = 15
 
-        # ToDo: Get all days market is closed in here as well (holidays)
+    # !plb shows at most the top leaderboard_max
+    leaderboard_max = 100
 
-        # if the market is open set submissions_open bool to False
-        # Close till 4:20:10pm EST to allow time for results to be run, and prediction storage to be cleared
-        if '09:30:00' <= current_time <= '16:20:10' and current_day != 5 and current_day != 6:
-            self.submissions_open = False
-        else:
+    def __init__(self, bot):
+        self.bot = bot
+        self.storage = get_storage()
+        self.market_data = get_market_data()
+        self.book = PredictionBook(self.storage)
+        self.prize_board = PredictionLeaderboard(self.storage)
+
+        # Rows of the top leaderboard_max for !plb, good until the next settlement changes prize_board.version
+        self.leaderboard_cache = None
+        self.leaderboard_cache_version = None
+
+        # (price, book version, Paginator) of the last !pred-status ranking, kept fresh by refresh_standings while
+        # the market is open. Outside of the session the price doesn't move, it's ranked again on demand
+        self.standings = None
+
+        self.scheduler = MarketScheduler(f"{constants.FilePaths.STORAGE_PATH}{os.sep}scheduler_state.json")
+        # The trading calendar skips holidays and moves the close (and results) up on half days
+        self.scheduler.add_job(DailyJob("market_open", self.on_market_open, trading_calendar.market_open))
+        self.scheduler.add_job(DailyJob("market_close", self.on_market_close, trading_calendar.market_close))
+        self.scheduler.add_job(DailyJob("results", self.on_results, self.results_time))
+        self.bot.loop.create_task(self.start_scheduler())
+
+    def cog_unload(self):
+        self.scheduler.stop()
+        self.refresh_standings.cancel()
+
+    def results_time(self, day):
+        close = trading_calendar.market_close(day)
+        if close is None:
+            return None
+        return (datetime.combine(day, close) + self.results_delay).time()
+
+    async def start_scheduler(self):
+        """Sets the submission state for the current time and hands the open/close/results timing to the scheduler.
+        Jobs missed while the bot was offline run once when it starts."""
+        await self.bot.wait_until_ready()
+
+        # Whatever happened last decides the state: open closes submissions, results re-open them
+        now = self.scheduler.now()
+        last = {name: self.scheduler.last_due(job, now) for name, job in self.scheduler.jobs.items()}
+        never = now - timedelta(days=365)
+        self.submissions_open = (last["results"] or never) >= (last["market_open"] or never)
+        self.awaiting_results = (last["market_close"] or never) > (last["results"] or never)
+        if trading_calendar.is_session_open(now):
+            self.refresh_standings.start()
+
+        self.scheduler.start()
+
+    async def on_market_open(self, when):
+        self.submissions_open = False
+        # Not for an open caught up on after the session already ended
+        if trading_calendar.is_session_open(self.scheduler.now()) and not self.refresh_standings.is_running():
+            self.refresh_standings.start()
+
+    async def on_market_close(self, when):
+        # Submissions stay closed until the results are in
+        self.awaiting_results = True
+
+        # No more yahoo calls until the next open, the next !pred-status ranks against the close
+        self.refresh_standings.stop()
+        self.standings = None
+
+    async def on_results(self, when):
+        channel = self.bot.get_channel(self.channel_id)
+        try:
+            # when is the session's own results time, also when it's caught up on days later
+            await self.post_results(channel, when.date())
+        finally:
+            self.awaiting_results = False
             self.submissions_open = True
 
-        # Run the results of current pending predictions
-        # Need to wait for yahoo to get proper close price so why not 420man:=)
-        # Need to set a time range here, since we are in a task with a timer of 5s
-        # We only want to run this check_results function once, so set our range check for 6s
-        if '16:20:00' <= current_time <= '16:20:06' and current_day != 5 and current_day != 6:
-            channel = self.bot.get_channel(self.channel_id)
-            await self.check_results(channel)
-
     @commands.command(
         name='predict',
         help="Make a prediction for $GME\n\n"
@@ -84,11 +142,6 @@ class PredictionGame(commands.Cog):
             await ctx.send(f"{user.mention} The PredictionGame commands are restricted to {channel.mention} only.")
             return
 
-        await self.create_new_predictions_object()
-
-        now = datetime.now()
-        current_time = now.strftime("%H:%M:%S")
-
         if self.submissions_open:
             res = await self.add_new_prediction_storage(user, prediction, method)
             if not res[0]:
@@ -100,121 +153,105 @@ class PredictionGame(commands.Cog):
                     return
 
             await channel.send(f'{user.mention} submitted a prediction of {prediction} ({method})')
+        elif self.awaiting_results:
+            results_at = self.scheduler.next_run(self.scheduler.jobs["results"], self.scheduler.now())
+            await channel.send(f'{user.mention} Submissions are closed while waiting for results. '
+                               f'Try again at {results_at.strftime("%I:%M%p").lstrip("0").lower()} EST')
         else:
-            if '16:00:00' <= current_time <= '16:20:10':
-                await channel.send(f'{user.mention} Submissions are closed while waiting for results. Try again at 4:20pm EST')
             await channel.send(f'{user.mention} Submissions are closed while the market is open!')
 
     @commands.command(name='check-results', hidden=True)
     @commands.is_owner()
     async def check_results(self, ctx):
+        await self.post_results(ctx, trading_calendar.last_session(self.scheduler.now()))
 
+    async def post_results(self, ctx, session):
+        """Scores the predictions against the close of session (a date), pays out and clears the book."""
         try:
             # Get the close price for GME
-            close_price = StockTickers.get_close_price("gme")
+            close_price = await self.market_data.get_close("gme", session)
+            if close_price is None:
+                raise Exception(f"no daily bar for {session}")
         except Exception as e:
             log.error(f"{e}")
             await ctx.send('There was an error with yfinance api :(\nNo results today, sorry.')
             return
 
-        # Had trouble with using self.get_prediction_storage_data() here so loading json directly instead
-        data = json.loads(open(f"{constants.FilePaths.STORAGE_PATH}{os.sep}predictions_today.json").read())
+        data = await self.get_prediction_storage_data()
 
         if not data:
             log.info(f"prediction_game check_results no prediction data!")
             await ctx.send('Whoops, looks like there are no predictions :(\nNo results today, sorry.')
             return
 
-        # This will sort the data relative to close price
-        sorted_array = sorted(data['predictions'], key=lambda d: abs(close_price - d['prediction']))
-
-        # message will hold the message text to send
-        message = "*Top Performers Today:*\n\n"
+        # Rank every prediction against the close price
+        scores = self.book.prediction_set().score(close_price)
 
-        place_titles = {
-            "msg_title1": "**:first_place: First Place: :first_place:**\n",
-            "msg_title2": "**:second_place: Second Place: :second_place:**\n",
-            "msg_title3": "**:third_place: Third Place: :third_place:**\n"
-        }
-        awards = {
-            "first": 1000,
-            "second": 500,
-            "third": 100,
-            "mayo": 50
-        }
+        # Work out every prize first, then pay them all out in one go
+        payouts = list(scores.payouts())
 
         try:
-            # Index used to store what place we are on in the loop
-            # Also by design, since the data is already sorted with first place at the beginning,
-            # this will keep track of what "place" we are on (first place, second, third ...)
-            index = 1
-
-            # To account for any scenarios where there is a tie (same prediction)
-            # At the end of each loop we store the previous users' prediction in this variable
-            # We can then compare this to the next users' prediction to see if they match
-            prev = None
-
-            # Loop through all predictions in the sorted array
-            # This means the loop is starting with the first place prediction
-            for prediction in sorted_array:
-
-                # Get the discord member
-                member = self.bot.get_user(prediction['user'])
-
-                # Make sure the user has data in the leaderboard json storage
-                await self.create_new_leaderboard_user(member)
-
-                if index <= 3:
-                    # Decrease index if current users' prediction is the same as previous users' prediction
-                    # This makes it so that if we start at first place, and the next prediction is the same,
-                    # there is a tie, and the second prediction also wins 1st place (etc. for 2nd and 3rd)
-                    if prev == prediction['prediction']:
-                        index -= 1
-                    else:
-                        # If no tie is found, append the place title text to the message
-                        message += place_titles[f"msg_title{index}"]
-
-                    # Append the members' name/prediction/method to the message
-                    message += f"> {member.mention} ${prediction['prediction']} ({prediction['method']}) \n"
-
-                    # Update the members' wallet with prize money
-                    await Currency.update_bank(Currency(self.bot), member, awards[list(awards)[index - 1]])
-
-                    # Update the leaderboard
-                    await self.update_leaderboard(member, awards[list(awards)[index - 1]], list(awards)[index - 1])
-
-                # Mayo time
-                elif index > 3:
-                    if close_price - (close_price * 0.01) <= prediction['prediction'] <= close_price + (close_price * 0.01):
-                        message += f"\n\n{self.mayo_emoji} = *Outside top 3 but within 1% of close price.*\n\n"
-                        message += f"> {member.mention} ${prediction['prediction']} ({prediction['method']}) \n"
-                        await Currency.update_bank(Currency(self.bot), member, 50)
-                        await self.update_leaderboard(member, awards["mayo"], "mayo")
-
-                index += 1  # Increment the index
-                prev = prediction['prediction']  # Set prev prediction for next iteration
+            await self.settle(scores, payouts)
 
         except Exception as e:
             log.error(f"{e}")
 
         finally:
-            now = datetime.now()
-            em = discord.Embed(
-                title=f"**__:trophy: {str(now.strftime('%A, %B %d %Y'))} just closed. ({round(close_price, 2)}) :trophy:__**",
-                color=discord.Color(0xfa43ee)
-            )
-            em.add_field(name="\u200b", value=message)
-            await ctx.send(embed=em)
+            await Paginator(
+                f"**__:trophy: {session.strftime('%A, %B %d %Y')} just closed. ({round(close_price, 2)}) :trophy:__**",
+                self.result_rows(payouts),
+                header="*Top Performers Today:*"
+            ).send(self.bot, ctx)
 
-            # Send updated leaderboard
-            await self.leaderboard(ctx)
+            # Send updated leaderboard. Not through the command, ctx is the channel when the scheduler runs this
+            if self.prize_board:
+                await self.leaderboard_pages(10).send(self.bot, ctx)
 
             # When check_results is done, clear the predictions for today
             await self.clear_prediction_storage()
 
+    def result_rows(self, payouts):
+        place_titles = {
+            "first": "**:first_place: First Place: :first_place:**",
+            "second": "**:second_place: Second Place: :second_place:**",
+            "third": "**:third_place: Third Place: :third_place:**",
+            "mayo": f"\n{self.mayo_emoji} = *Outside top 3 but within 1% of close price.*\n"
+        }
+
+        title = None
+        for user_id, prediction, method, award in payouts:
+            # One title per place, tied predictions are listed under the same title
+            if award != title:
+                yield place_titles[award]
+                title = award
+
+            yield f"> <@{user_id}> ${prediction} ({method}) +${self.awards[award]}"
+
+    async def settle(self, scores, payouts):
+        """Commits the payouts with one batched write to the bank and one to the leaderboard.
+
+        Args:
+            scores: the PredictionScores of the day
+            payouts: (user_id, prediction, method, award) of every winner
+        """
+        wallet_changes = {}
+        leaderboard_awards = []
+        for user_id, _, _, award in payouts:
+            wallet_changes[user_id] = wallet_changes.get(user_id, 0) + self.awards[award]
+            leaderboard_awards.append((user_id, self.awards[award], award))
+
+        # Prizes go through the Currency cogs' ledger, so the balances stay in one place
+        currency = self.bot.get_cog('Currency')
+        currency.ledger.credit(wallet_changes, reason="prize")
+        await currency.ledger.flush()
+
+        # Everybody who played shows up on the leaderboard, winners or not
+        participants = set(scores.predictions.user_ids.tolist())
+        self.prize_board.add_awards(leaderboard_awards, participants=participants)
+
     @commands.command(
         name="plb",
-        help="Display the leaderboard of predictions",
+        help=f"Display the leaderboard of predictions, the top x (at most {leaderboard_max})",
         brief="Prediction leaderboard"
     )
     async def leaderboard(self, ctx, x=10):
@@ -225,66 +262,50 @@ class PredictionGame(commands.Cog):
             await ctx.send(f"{ctx.author.mention} The PredictionGame commands are restricted to {channel.mention} only.")
             return
 
-        # Get the leaderboard storage
-        users = await self.get_leaderboard_storage_data()
-        if not users:
+        if not self.prize_board:
             await ctx.send('No leaderboard yet :(')
             return
 
-        # This will sort the users by prize_total
-        top_users = sorted(users, key=lambda k: -users[k]["prize_total"])
-
-        # Strings used to hold each field for the message
-        message = ""
-
-        # Used for loop below to track position
-        i = 0
-
-        try:
-            # Loop through sorted totals
-            for user in top_users:
-
-                # Set leaderboard to only show top x
-                if i == x:
-                    break
-
-                # Some variable to help see whats going on
-                member = self.bot.get_user(int(user))
-                prize_total = users[user]["prize_total"]
-                awards = users[user]["awards"]
-
-                # Append @user and prize total to message string
-                message += f"**{i + 1}:**  {member.mention} - ${prize_total}"
-
-                # Loop through awards
-                for key in awards.keys():
-                    if awards[key] != 0:
-                        if key != "mayo":
-                            message += f" - :{key}_place:*x{awards[key]}*"
-                        else:
-                            message += f" - {self.mayo_emoji} *x{awards[key]}*"
-
-                # Add new line to message, and increase position
-                message += "\n"
-                i += 1
-
-        except Exception as e:
-            log.error(f"{e}")
+        await self.leaderboard_pages(x).send(self.bot, ctx)
+
+    def leaderboard_pages(self, x):
+        """Pages of the top x (at most leaderboard_max) of the leaderboard. The rows are formatted once per change
+        to the board, the title is dated every time."""
+        if self.leaderboard_cache_version != self.prize_board.version:
+            self.leaderboard_cache = list(self.leaderboard_rows(self.leaderboard_max))
+            self.leaderboard_cache_version = self.prize_board.version
+
+        x = max(1, min(x, self.leaderboard_max))
+        return Paginator(
+            f"**__:trophy: Leaderboard as of {str(self.scheduler.now().strftime('%A, %B %d %Y'))} :trophy:__**",
+            self.leaderboard_cache[:x]
+        )
+
+    def leaderboard_rows(self, x):
+        for rank, user_id, prize_total in self.prize_board.top(x):
+            # @user and prize total
+            row = f"**{rank}:**  <@{user_id}> - ${prize_total}"
+
+            # Loop through awards
+            awards = self.prize_board.users[user_id]["awards"]
+            for key in awards.keys():
+                if awards[key] != 0:
+                    if key != "mayo":
+                        row += f" - :{key}_place:*x{awards[key]}*"
+                    else:
+                        row += f" - {self.mayo_emoji} *x{awards[key]}*"
 
-        finally:
-            em = discord.Embed(
-                title=f"**__:trophy: Leaderboard as of {str(datetime.now().strftime('%A, %B %d %Y'))} :trophy:__**\n",
-                color=discord.Color(0xfa43ee)
-            )
-            em.add_field(name="\u200b", value=message)
-            await ctx.send(embed=em)
+            yield row
 
     @commands.command(
         name="pred-status",
-        help="Display the current days' predictions in relation to the current price.",
+        help="Display the current days' predictions in relation to the current price.\n\n"
+             "Params:\n"
+             "> page: The page of the standings to show, closest predictions first\n\n"
+             "Example: !pred-status 2",
         brief="Current Predictions"
     )
-    async def prediction_status(self, ctx):
+    async def prediction_status(self, ctx, page=1):
 
         # Make sure we are in proper channel, and exit if not
         channel = self.bot.get_channel(self.channel_id)
@@ -292,148 +313,79 @@ class PredictionGame(commands.Cog):
             await ctx.send(f"{ctx.author.mention} The PredictionGame commands are restricted to {channel.mention} only.")
             return
 
-        # Had trouble with using self.get_prediction_storage_data() here so loading json directly instead
-        data = json.loads(open(f"{constants.FilePaths.STORAGE_PATH}{os.sep}predictions_today.json").read())
-
         # If no data send message back, and exit
-        if not data:
+        if not self.book:
             await ctx.send('No predictions for today yet :(')
             return
 
-        try:
-            # Get the current price for GME
-            current_price = StockTickers.get_close_price("gme")
-        except Exception as e:
-            log.error(f"{e}")
-            await ctx.send('There was an error with yfinance api :(')
+        standings = self.standings
+        if standings is None or standings[1] != self.book.version:
+            # Something was submitted since the last ranking, or nothing was ranked since the close
+            try:
+                current_price = (await self.market_data.get_quote("gme")).close
+            except Exception as e:
+                log.error(f"{e}")
+                await ctx.send('There was an error with yfinance api :(')
+                return
+            standings = self.update_standings(current_price)
+
+        await standings[2].send(self.bot, channel, page=page)
+
+    @tasks.loop(seconds=30)
+    async def refresh_standings(self):
+        """Re-ranks the predictions for !pred-status during the session, only when the price or the book changed.
+        Started at market open and stopped at the close by the scheduler."""
+        if not self.book:
+            self.standings = None
             return
 
-        # This will sort the data relative to price
-        sorted_array = sorted(data['predictions'], key=lambda d: abs(current_price - d['prediction']))
-
-        # Strings used to hold each field for the embed
-        message = f"*$GME price is* ${round(current_price, 2)}\n\n"
-
-        i = 0
-
         try:
-            # Loop through sorted totals
-            for user in sorted_array:
-
-                # Get % deviation
-                deviation = round(abs(user["prediction"] - current_price), 4)
-
-                # Append name and prize_total to strings
-                member = self.bot.get_user(user['user'])
-                message += f"{i + 1}: {member.mention}  {user['prediction']}  ({user['method']}) ({deviation} %)\n"
-
-                # increase position
-                i += 1
-
+            current_price = (await self.market_data.get_quote("gme")).close
         except Exception as e:
             log.error(f"{e}")
+            return
 
-        finally:
-            em = discord.Embed(
-                title=f"**__Current predictions today {str(datetime.now().strftime('%A, %B %d %Y'))}__**",
-                color=discord.Color(0xfa43ee)
-            )
-            em.add_field(name='\u200b', value=message)
-            await channel.send(embed=em)
-
-    async def create_new_predictions_object(self):
-
-        data = await self.get_prediction_storage_data()
-
-        if data:
-            return False
-        else:
-            data = {'predictions': []}
-
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}predictions_today.json', 'w') as f:
-            json.dump(data, f, indent=4)
-
-        return True
-
-    @staticmethod
-    async def get_prediction_storage_data():
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}predictions_today.json', 'r') as f:
-            data = json.load(f)
-
-        return data
-
-    @staticmethod
-    async def clear_prediction_storage():
-        data = {}
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}predictions_today.json', 'w') as f:
-            json.dump(data, f, indent=4)
+        self.update_standings(current_price)
+
+    @refresh_standings.before_loop
+    async def before_refresh_standings(self):
+        await self.bot.wait_until_ready()
+
+    def update_standings(self, current_price):
+        if self.standings is not None and self.standings[:2] == (current_price, self.book.version):
+            return self.standings
+
+        pages = Paginator(
+            f"**__Current predictions today {str(self.scheduler.now().strftime('%A, %B %d %Y'))}__**",
+            self.standing_rows(current_price, self.book.version),
+            header=f"*$GME price is* ${round(current_price, 2)}",
+            rows_per_page=self.status_page_size
+        )
+        # The first page is what gets asked for, have it ready
+        pages.page(1)
+        self.standings = (current_price, self.book.version, pages)
+        return self.standings
+
+    def standing_rows(self, current_price, version):
+        """Rows nearest to the price first, formatted as the pages ask for them."""
+        for i, (item, distance, _) in enumerate(self.book.nearest(current_price, len(self.book))):
+            if self.book.version != version:
+                # The book moved under us, a fresh ranking replaces these pages
+                return
+            # Mentions instead of get_user, the rows don't need the member cache
+            yield f"{i + 1}: <@{item['user']}>  {item['prediction']}  ({item['method']}) ({round(distance, 4)} %)"
+
+    async def get_prediction_storage_data(self):
+        if not self.book:
+            return {}
+
+        return {'predictions': self.book.entries}
+
+    async def clear_prediction_storage(self):
+        self.book.clear()
 
     async def add_new_prediction_storage(self, user, prediction, method):
-        data = await self.get_prediction_storage_data()
-
-        count = 0
-        for item in data["predictions"]:
-            # print(item)
-            if item["user"] == user.id:
-                count += 1
-                if item["method"] == method:
-                    return [False, 1]
-
-        # print(count)
-        if count >= 3:
-            return [False, 2]
-
-        data['predictions'].append({
-            "user": user.id,
-            "prediction": prediction,
-            "method": method
-        })
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}predictions_today.json', 'w') as f:
-            json.dump(data, f, indent=4)
-
-        return [True]
-
-    async def create_new_leaderboard_user(self, user):
-
-        users = await self.get_leaderboard_storage_data()
-
-        if str(user.id) in users:
-            return False
-        else:
-            users[str(user.id)] = {}
-            users[str(user.id)]["prize_total"] = 0
-            users[str(user.id)]["awards"] = {"first": 0, "second": 0, "third": 0, "mayo": 0}
-
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}prediction_leaderboards.json', 'w') as f:
-            json.dump(users, f, indent=4)
-
-        return True
-
-    @staticmethod
-    async def get_leaderboard_storage_data():
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}prediction_leaderboards.json', 'r') as f:
-            users = json.load(f)
-
-        return users
-
-    async def update_leaderboard(self, user, prize_total, award):
-        users = await self.get_leaderboard_storage_data()
-
-        users[str(user.id)]["prize_total"] += prize_total
-
-        if award == "first":
-            users[str(user.id)]["awards"]["first"] += 1
-        elif award == "second":
-            users[str(user.id)]["awards"]["second"] += 1
-        elif award == "third":
-            users[str(user.id)]["awards"]["third"] += 1
-        elif award == "mayo":
-            users[str(user.id)]["awards"]["mayo"] += 1
-
-        with open(f'{constants.FilePaths.STORAGE_PATH}{os.sep}prediction_leaderboards.json', 'w') as f:
-            json.dump(users, f, indent=4)
-
-        return True
+        return self.book.add(user.id, prediction, method)
 
 
 def setup(bot):
@@ -1,14 +1,19 @@
 import io
-import os
+from datetime import datetime
 
 from yfinance import shared
 
 import constants
 import discord
-import matplotlib.pyplot as plt
-import yfinance as yf
 import logging as log
 from discord.ext import commands
+from util.cache import ByteLRUCache, MISSING
+from util.charts import ChartRenderer
+from util import trading_calendar
+from util.bar_store import Bars
+from util.market_data import get_market_data
+from util import options
+from util.scheduler import MARKET_TIMEZONE
 
 
 class StockTickers(commands.Cog):
@@ -18,24 +23,12 @@ class StockTickers(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.market_data = get_market_data()
+        self.renderer = ChartRenderer(constants.Charts.WORKERS, constants.Charts.MAX_POINTS, constants.Charts.TIMEOUT)
+        self.chart_cache = ByteLRUCache(constants.Charts.CACHE_BYTES)
 
-    @staticmethod
-    def get_close_price(symbol):
-        ticker = yf.Ticker(symbol)
-        data_today = ticker.history(threads=False, period='1d')
-        if data_today.empty:
-            return False
-        else:
-            return data_today['Close'][0]
-
-    @staticmethod
-    def get_open_price(symbol):
-        ticker = yf.Ticker(symbol)
-        data_today = ticker.history(period='1d')
-        if data_today.empty:
-            return False
-        else:
-            return data_today['Open'][0]
+    def cog_unload(self):
+        self.renderer.close()
 
     @commands.command(
         name="ticker-close",
@@ -43,12 +36,21 @@ class StockTickers(commands.Cog):
         brief="Stock close"
     )
     async def get_close(self, ctx, symbol):
-        price = self.get_close_price(symbol)
-        if not price:
+        try:
+            quote = await self.market_data.get_quote(symbol)
+        except Exception as e:
+            log.error(f"Error: {e}")
+            quote = None
+        if not quote:
             await ctx.send(f"There was an error with the yfinance api :(\nError: {shared._ERRORS}")
             log.error(f"Error: {shared._ERRORS}")
             return
-        await ctx.send(f'${symbol} Closing price today is ${price}')
+        today = datetime.now(MARKET_TIMEZONE).date()
+        if not trading_calendar.is_trading_day(today):
+            closed_for = trading_calendar.holiday_name(today) or "the weekend"
+            await ctx.send(f'${symbol} Market is closed for {closed_for}, last closing price was ${quote.close}')
+            return
+        await ctx.send(f'${symbol} Closing price today is ${quote.close}')
 
     @commands.command(
         name="ticker-open",
@@ -56,64 +58,84 @@ class StockTickers(commands.Cog):
         brief="Stock open"
     )
     async def get_open(self, ctx, symbol):
-        price = self.get_open_price(symbol)
-        if not price:
+        try:
+            quote = await self.market_data.get_quote(symbol)
+        except Exception as e:
+            log.error(f"Error: {e}")
+            quote = None
+        if not quote:
             await ctx.send(f"There was an error with the yfinance api :(\nError: {shared._ERRORS}")
             log.error(f"Error: {shared._ERRORS}")
             return
-        await ctx.send(f'{symbol} Opening price today is ${price}')
+        await ctx.send(f'{symbol} Opening price today is ${quote.open}')
+
+    @commands.command(
+        name='quote',
+        aliases=['q'],
+        help="Display the open and close price of one or more stocks\n\n"
+             "Params:\n"
+             "> symbols: The symbols for the stocks, separated by spaces or commas\n\n"
+             "Example: !quote gme amc bb",
+        brief="Stock quotes"
+    )
+    async def quote(self, ctx, *symbols):
+        symbols = parse_symbols(symbols)
+        if not symbols:
+            await ctx.send("Which stocks? Example: !quote gme amc bb")
+            return
+        if len(symbols) > constants.MarketData.MAX_SYMBOLS:
+            await ctx.send(f"{constants.MarketData.MAX_SYMBOLS} symbols at most please")
+            return
+
+        try:
+            quotes = await self.market_data.get_quotes(symbols)
+        except Exception as e:
+            await ctx.send(f"There was an error with the yfinance api :(\nError: {shared._ERRORS}")
+            log.error(f"Error: {e}\n{shared._ERRORS}")
+            return
+
+        today = datetime.now(MARKET_TIMEZONE).date()
+        if trading_calendar.is_trading_day(today):
+            description = "Open and latest price today"
+        else:
+            description = f"Market is closed for {trading_calendar.holiday_name(today) or 'the weekend'}, " \
+                          f"prices of the last trading day"
+        embed = discord.Embed(title="Quotes", description=description, colour=0x00b2ff)
+        for symbol, quote in quotes.items():
+            if quote is None:
+                embed.add_field(name=f"${symbol}", value="No data", inline=True)
+                continue
+            change = (quote.close / quote.open - 1) * 100 if quote.open else 0.0
+            embed.add_field(
+                name=f"${symbol}",
+                value=f"Open ${quote.open:.2f}\nNow ${quote.close:.2f} ({change:+.2f}%)",
+                inline=True
+            )
+        await ctx.send(embed=embed)
 
     @commands.command(
         name='graph',
         aliases=['gr'],
         help="Display the graph for a stock\n\n"
              "Params:\n"
-             "> symbol: The symbol for the stock\n"
+             "> symbol: The symbol for the stock, several separated by commas to compare them\n"
              "> period: The time period for the graph\n"
              "> interval: The time interval for the graph\n\n"
              "Valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max\n"
              "Valid intervals: 1m,2m,5m,15m,30m,60m,90m,1h,1d,5d,1wk,1mo,3mo\n\n"
-             "Example: !graph gme 5d",
+             "Example: !graph gme 5d\n"
+             "Example: !graph gme,amc 5d",
         brief="Stock graph"
     )
     async def graph(self, ctx, symbol, period="1d", interval="1m"):
-        # https://pypi.org/project/yfinance/
+        symbols = parse_symbols([symbol])
+        if len(symbols) > 1:
+            await self.comparison_graph(ctx, symbols, period, interval)
+            return
+
         try:
-            data = yf.download(  # or pdr.get_data_yahoo(...
-                # tickers list or string as well
-                tickers=symbol,
-
-                # use "period" instead of start/end
-                # valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
-                # (optional, default is '1mo')
-                period=period,
-
-                # fetch data by interval (including intraday if period < 60 days)
-                # valid intervals: 1m,2m,5m,15m,30m,60m,90m,1h,1d,5d,1wk,1mo,3mo
-                # (optional, default is '1d')
-                interval=interval,
-
-                # group by ticker (to access via data['SPY'])
-                # (optional, default is 'column')
-                group_by='column',
-
-                # adjust all OHLC automatically
-                # (optional, default is False)
-                auto_adjust=True,
-
-                # download pre/post regular market hours data
-                # (optional, default is False)
-                prepost=True,
-
-                # use threads for mass downloading? (True/False/Integer)
-                # (optional, default is True)
-                threads=True,
-
-                # proxy URL scheme use use when downloading?
-                # (optional, default is None)
-                proxy=None
-            )
-            if data.empty:
+            bars = await self.market_data.get_bars(symbol, period, interval)
+            if bars.empty:
                 raise Exception
 
         except Exception as e:
@@ -129,18 +151,67 @@ class StockTickers(commands.Cog):
             url=link
         )
 
-        plt.clf()
-        plt.style.use('dark_background')
-        data['Close'].plot(color='#47a0ff')
-        plt.xlabel("Date")
-        plt.ylabel("Close")
-        plt.title(f"${symbol.upper()} Price data")
-        plt.savefig(f"{constants.FilePaths.IMAGES_PATH}{os.sep}graph.png", transparent=True)
+        # The same chart is only drawn again once a new bar came in
+        chart_key = (symbol.upper(), period, interval, bars.times[-1], bars.close[-1])
+        png = self.chart_cache.get(chart_key)
+        if png is MISSING:
+            try:
+                png = await self.renderer.price_chart(f"${symbol.upper()} Price data", bars.times, bars.close)
+            except Exception as e:
+                await ctx.send(f"There was an error drawing the graph :(\nError: {e}")
+                log.error(f"{e}")
+                return
+            self.chart_cache.set(chart_key, png)
+
+        image = discord.File(io.BytesIO(png), filename='graph.png')
+        embed.set_image(url=f'attachment://graph.png')
+
+        try:
+            await ctx.send(file=image, embed=embed)
+        except Exception as e:
+            await ctx.send(f"There was an error sending the graph :(\nError: {e}")
+            log.error(f"{e}")
+            return
+
+    async def comparison_graph(self, ctx, symbols, period, interval):
+        """graph for several symbols, one download and one chart with a line per symbol."""
+        if len(symbols) > constants.MarketData.MAX_SYMBOLS:
+            await ctx.send(f"{constants.MarketData.MAX_SYMBOLS} symbols at most please")
+            return
+
+        try:
+            histories = await self.market_data.get_histories(symbols, period, interval)
+            bars = [Bars.from_frame(symbol, interval, data) for symbol, data in histories.items()]
+            bars = [symbol_bars for symbol_bars in bars if not symbol_bars.empty]
+            if not bars:
+                raise Exception
 
-        with open(f"{constants.FilePaths.IMAGES_PATH}{os.sep}graph.png", 'rb') as f:
-            file = io.BytesIO(f.read())
+        except Exception as e:
+            await ctx.send(f"There was an error with the yfinance api :(\nError: {shared._ERRORS}")
+            log.error(f"Error: {e}\n{shared._ERRORS}")
+            return
+
+        title = " vs ".join(f"${symbol_bars.symbol}" for symbol_bars in bars)
+        embed = discord.Embed(title=f"{title} - {period} - {interval}", colour=0x00b2ff)
 
-        image = discord.File(file, filename='graph.png')
+        chart_key = (
+            tuple(symbol_bars.symbol for symbol_bars in bars), period, interval,
+            tuple((symbol_bars.times[-1], symbol_bars.close[-1]) for symbol_bars in bars)
+        )
+        png = self.chart_cache.get(chart_key)
+        if png is MISSING:
+            try:
+                png = await self.renderer.comparison_chart(
+                    f"{title} Change since {period} ago",
+                    [(f"${symbol_bars.symbol}", symbol_bars.times, symbol_bars.close) for symbol_bars in bars]
+                )
+            except Exception as e:
+                await ctx.send(f"There was an error drawing the graph :(\nError: {e}")
+                log.error(f"{e}")
+                return
+            self.chart_cache.set(chart_key, png)
+
+        image = discord.File(io.BytesIO(png), filename='graph.png')
         embed.set_image(url=f'attachment://graph.png')
 
         try:
@@ -152,31 +223,60 @@ class StockTickers(commands.Cog):
 
     @commands.command(
         name='ticker-options',
-        help="Display the options chain for a stock\n\n"
+        aliases=['options'],
+        help="Display a summary of the options chain for a stock\n\n"
              "Params:\n"
              "> symbol: The symbol for the stock\n\n"
+             f"Covers the {constants.Options.MAX_EXPIRIES} nearest expiries: max pain of the nearest one, "
+             "put/call ratios, implied volatility and the strikes with the most open interest\n\n"
              "Example: !options gme",
         brief="Stock options"
     )
-    @commands.is_owner()  # testing, this download a lot of shit
     async def ticker_options(self, ctx, symbol):
-        # https://pypi.org/project/yfinance/
+        symbol = symbol.upper()
         try:
-            ticker = yf.Ticker(symbol)
-            options = ticker.options
-
-            for date in options:
-                chain = ticker.option_chain(date)
-                print(chain)
-
-            #if options.empty:
-             #   raise Exception
+            expiries = (await self.market_data.get_option_expiries(symbol))[:constants.Options.MAX_EXPIRIES]
+            if not expiries:
+                raise Exception
+            chains = await self.market_data.get_option_chains(symbol, expiries)
+            chains = [chain for chain in chains if not chain.empty]
+            if not chains:
+                raise Exception
 
         except Exception as e:
             await ctx.send(f"There was an error with the yfinance api :(\nError: {shared._ERRORS}")
             log.error(f"Error: {e}\n{shared._ERRORS}")
             return
 
+        embed = discord.Embed(
+            title=f"${symbol} options",
+            description=f"{len(chains)} nearest expiries, {chains[0].expiry} to {chains[-1].expiry}",
+            colour=0x00b2ff,
+            url=f'https://finance.yahoo.com/quote/{symbol}/options'
+        )
+
+        def number(value, template):
+            return "-" if value is None else template.format(value)
+
+        nearest = chains[0]
+        embed.add_field(name=f"Max pain {nearest.expiry}", value=number(options.max_pain(nearest), "${:.2f}"))
+        embed.add_field(
+            name="Put/call ratio",
+            value=f"OI {number(options.put_call_ratio(chains), '{:.2f}')}\n"
+                  f"Volume {number(options.put_call_ratio(chains, 'volume'), '{:.2f}')}"
+        )
+        embed.add_field(
+            name=f"IV {nearest.expiry}",
+            value=f"Calls {number(options.weighted_iv(nearest.calls), '{:.0%}')}\n"
+                  f"Puts {number(options.weighted_iv(nearest.puts), '{:.0%}')}"
+        )
+
+        lines = options.histogram_lines(*options.open_interest_by_strike(chains), rows=constants.Options.HISTOGRAM_ROWS)
+        if lines:
+            embed.add_field(name="Open interest by strike", value="```\n" + "\n".join(lines) + "\n```", inline=False)
+
+        await ctx.send(embed=embed)
+
     @commands.command(
         name='ticker-info',
         help="Display the info for a stock\n\n"
@@ -185,23 +285,60 @@ class StockTickers(commands.Cog):
              "Example: !ticker-info gme",
         brief="Stock info"
     )
-    @commands.is_owner()  # testing, this download a lot of shit
     async def ticker_info(self, ctx, symbol):
-        # https://pypi.org/project/yfinance/
+        symbol = symbol.upper()
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-
-            if info.empty:
-                raise Exception
-
-            return info
-
+            info = await self.market_data.get_fundamentals(symbol)
         except Exception as e:
             await ctx.send(f"There was an error with the yfinance api :(\nError: {shared._ERRORS}")
             log.error(f"Error: {e}\n{shared._ERRORS}")
             return
 
+        if info is None:
+            await ctx.send(f"Yahoo doesn't know ${symbol}")
+            return
+
+        embed = discord.Embed(
+            title=f"${symbol} - {info.name or info.short_name}",
+            description=info.summary or "\u200b",
+            colour=0x00b2ff,
+            url=f'https://finance.yahoo.com/quote/{symbol}'
+        )
+        if info.sector or info.industry:
+            embed.add_field(name="Sector", value=" / ".join(filter(None, (info.sector, info.industry))), inline=False)
+
+        currency = f" {info.currency}" if info.currency else ""
+        fields = (
+            ("Market cap", info.market_cap, lambda value: f"{human_number(value)}{currency}"),
+            ("Shares outstanding", info.shares_outstanding, human_number),
+            ("Float", info.float_shares, human_number),
+            ("Short % of float", info.short_percent_of_float, lambda value: f"{value:.2%}"),
+            ("P/E (trailing)", info.trailing_pe, lambda value: f"{value:.2f}"),
+        )
+        for name, value, formatter in fields:
+            if value is not None:
+                embed.add_field(name=name, value=formatter(value), inline=True)
+        if info.year_low is not None and info.year_high is not None:
+            embed.add_field(name="52 week range", value=f"{info.year_low:.2f} - {info.year_high:.2f}", inline=True)
+
+        if info.website:
+            embed.set_footer(text=info.website)
+
+        await ctx.send(embed=embed)
+
+
+def human_number(value) -> str:
+    """1234567 as 1.23M."""
+    for limit, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "k")):
+        if abs(value) >= limit:
+            return f"{value / limit:.2f}{suffix}"
+    return f"{value:,.0f}"
+
+
+def parse_symbols(args) -> list:
+    """"gme amc" or "gme,amc" style arguments as a list of upper case symbols, in order and without duplicates."""
+    symbols = (symbol.strip().upper() for arg in args for symbol in arg.split(","))
+    return list(dict.fromkeys(symbol for symbol in symbols if symbol))
 
 
 def setup(bot):
@@ -16,6 +16,59 @@ class FilePaths(object):
     COGS_PATH = ""
     STORAGE_PATH = ""
     IMAGES_PATH = ""
+    CONFIG_PATH = ""
+
+
+class Storage(object):
+    BACKEND = "sqlite"  # "sqlite" or "json", the json files are migrated into sqlite on first start
+    DATABASE = "discord_bot.sqlite3"
+    JOURNAL_COMPACT_BYTES = 1024 * 1024  # json backend, bank.json is rewritten once the bank journal gets this big
+
+
+class MarketData(object):
+    WORKERS = 4  # threads doing the blocking yfinance calls
+    TIMEOUT = 15.0  # seconds before a fetch is given up on
+    CACHE_SIZE = 256  # (symbol, period, interval) histories kept around
+    MAX_SYMBOLS = 10  # symbols one !quote or comparison !graph may ask for
+    BAR_STORE_BYTES = 256 * 1024 * 1024  # storage/bars at most, the least recently used series are deleted first
+    FUNDAMENTALS_SIZE = 512  # symbols whose ticker-info fields are kept around
+    FUNDAMENTALS_TTL = 6 * 60 * 60  # seconds, these change about once a quarter
+
+    # Seconds a fetched history stays fresh, by bar interval. Anything not listed uses 60s
+    HISTORY_TTL = {
+        "1m": 30,
+        "2m": 60,
+        "5m": 120,
+        "15m": 300,
+        "30m": 300,
+        "60m": 600,
+        "90m": 600,
+        "1h": 600,
+        "1d": 30,  # also backs the quotes, keep it short
+        "5d": 900,
+        "1wk": 1800,
+        "1mo": 3600,
+        "3mo": 3600,
+    }
+
+
+class Options(object):
+    MAX_EXPIRIES = 8  # nearest expiries ticker-options looks at
+    CONCURRENCY = 2  # chains downloaded at the same time, leaves market data workers for everything else
+    CHAIN_TTL = 300  # seconds a downloaded chain is used for
+    EXPIRY_TTL = 3600  # seconds the list of expiries is used for
+    HISTOGRAM_ROWS = 12  # strikes shown in the open interest histogram
+
+
+class Charts(object):
+    WORKERS = 2  # processes rendering graphs
+    CACHE_BYTES = 32 * 1024 * 1024  # rendered PNGs kept in memory
+    MAX_POINTS = 640  # points drawn per line at most, the default figure is 640px wide
+    TIMEOUT = 30  # seconds a graph may take to render
+
+
+class Slots(object):
+    SEED = None  # set an int to replay the same spins, e.g. when testing odds changes
 
 
 class Timezones(object):
@@ -0,0 +1,99 @@
+import asyncio
+import datetime as dt
+import os
+
+import numpy as np
+import pandas as pd
+
+import util.market_data
+from util.bar_store import BarStore
+from util.market_data import MarketDataClient
+
+
+def _frame(first: str, bars: int, freq: str = "1min", price: float = 10.0) -> pd.DataFrame:
+    index = pd.date_range(first, periods=bars, freq=freq, tz="America/New_York")
+    close = np.full(bars, price)
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": close}, index=index)
+
+
+class Fetch():
+    """fetch(start, period) for BarStore.update, hands out the frames it was given and notes the calls."""
+    def __init__(self, *frames):
+        self.frames = list(frames)
+        self.calls = []
+
+    def __call__(self, start=None, period=None):
+        self.calls.append((start, period))
+        return self.frames.pop(0) if self.frames else _frame("2026-01-01", 0)
+
+
+def test_incremental_refresh_starts_at_the_last_stored_day(tmp_path):
+    store = BarStore(str(tmp_path))
+    today = dt.date.today()
+    fetch = Fetch(_frame(f"{today} 09:30", 10), _frame(f"{today} 09:35", 10, price=11.0))
+
+    store.update("GME", "1m", fetch, start=today, period="1d")
+    store.update("GME", "1m", fetch, start=today, period="1d")
+
+    assert fetch.calls == [(today, None), (today, None)]
+    bars = store.read("GME", "1m", today)
+    assert len(bars) == 15
+    assert bars.close[4] == 10.0 and bars.close[-1] == 11.0
+
+
+def test_series_older_than_the_fetch_window_is_fetched_by_period_again(tmp_path):
+    store = BarStore(str(tmp_path))
+    today = dt.date.today()
+    old = today - dt.timedelta(days=30)
+    store.update("GME", "1m", Fetch(_frame(f"{old} 09:30", 10)), start=old, period="1d")
+
+    fetch = Fetch(_frame(f"{today} 09:30", 5))
+    store.update("GME", "1m", fetch, start=today, period="1d")
+
+    assert fetch.calls == [(None, "1d")]
+    # The old bars are dropped with it, there would be a hole between them and the new ones
+    assert len(store.read("GME", "1m")) == 5
+
+
+def test_least_recently_used_series_are_evicted(tmp_path):
+    store = BarStore(str(tmp_path))
+    today = dt.date.today()
+    for symbol in ("AAA", "BBB"):
+        store.update(symbol, "1m", Fetch(_frame(f"{today} 09:30", 100)), start=today)
+    os.utime(tmp_path / "AAA_1m.json", (0, 0))
+
+    store.max_bytes = os.path.getsize(tmp_path / "BBB_1m.npy") * 2 + 1
+    store.update("CCC", "1m", Fetch(_frame(f"{today} 09:30", 100)), start=today)
+
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".npy")) == ["BBB_1m.npy", "CCC_1m.npy"]
+    assert store.read("AAA", "1m").empty
+
+
+def _client_at(monkeypatch, tmp_path, now: dt.datetime, frame: pd.DataFrame) -> MarketDataClient:
+    class Clock(dt.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return tz.localize(now)
+
+    monkeypatch.setattr(util.market_data, "datetime", Clock)
+    client = MarketDataClient(bar_store=BarStore(str(tmp_path)))
+    monkeypatch.setattr(client, "_download", lambda symbol, period, interval, start=None, threads=False: frame)
+    return client
+
+
+def test_last_session_is_served_before_the_open(monkeypatch, tmp_path):
+    # Monday 2am, the last bars are Friday's
+    client = _client_at(monkeypatch, tmp_path, dt.datetime(2026, 10, 19, 2, 0), _frame("2026-10-16 09:30", 390))
+
+    bars = asyncio.run(client.get_bars("gme", "1d", "1m"))
+    client.close()
+    assert len(bars) == 390
+
+
+def test_stale_bars_are_not_served_as_current(monkeypatch, tmp_path):
+    # Yahoo quietly had nothing newer than two weeks ago
+    client = _client_at(monkeypatch, tmp_path, dt.datetime(2026, 10, 19, 12, 0), _frame("2026-10-02 09:30", 1, "1D"))
+
+    quote = asyncio.run(client.get_quote("gme"))
+    client.close()
+    assert quote is None
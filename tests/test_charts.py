@@ -0,0 +1,43 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from util.charts import ChartRenderer
+
+
+def _die(*args):
+    os._exit(1)
+
+
+def _hang(*args):
+    time.sleep(2)
+
+
+def test_broken_pool_is_replaced():
+    renderer = ChartRenderer(max_workers=1)
+    broken = renderer._executor
+
+    async def run():
+        with pytest.raises(BrokenProcessPool):
+            await renderer._render(_die)
+        return await renderer.price_chart("GME", np.arange(10.0), np.arange(10.0))
+
+    png = asyncio.run(run())
+    renderer.close()
+    assert renderer._executor is not broken
+    assert png.startswith(b"\x89PNG")
+
+
+def test_render_times_out():
+    renderer = ChartRenderer(max_workers=1, timeout=0.1)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await renderer._render(_hang)
+
+    asyncio.run(run())
+    renderer.close()
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+
+from util.ledger import BankLedger
+
+
+class RecordingStorage():
+    """Storage stand-in that notes the inventories committed, the first commit takes a while."""
+    def __init__(self):
+        self.commits = []
+        self.slow = True
+        self.lock = threading.Lock()
+
+    def load_accounts(self) -> dict:
+        return {}
+
+    def commit_accounts(self, created, wallet_deltas, inventories, mutations=()):
+        if self.slow:
+            self.slow = False
+            time.sleep(0.2)
+        with self.lock:
+            self.commits.append(inventories)
+
+
+def test_overlapping_flushes_commit_in_order():
+    storage = RecordingStorage()
+    ledger = BankLedger(storage, flush_delay=3600)
+
+    async def run():
+        async with ledger.transaction(1, reason="buy") as txn:
+            txn.add_item(1, "mayo", 1)
+        first = asyncio.ensure_future(ledger.flush())
+        await asyncio.sleep(0.01)
+
+        async with ledger.transaction(1, reason="buy") as txn:
+            txn.add_item(1, "mayo", 1)
+        await asyncio.gather(first, ledger.flush())
+        ledger.close()
+
+    asyncio.run(run())
+
+    # The newer snapshot lands last, even though the older commit was the slow one
+    assert storage.commits == [{"1": {"mayo": 1}}, {"1": {"mayo": 2}}]
+
+
+def test_flush_now_waits_for_a_running_commit():
+    storage = RecordingStorage()
+    ledger = BankLedger(storage, flush_delay=3600)
+
+    async def run():
+        async with ledger.transaction(1, reason="buy") as txn:
+            txn.add_item(1, "mayo", 1)
+        flush = asyncio.ensure_future(ledger.flush())
+        await asyncio.sleep(0.01)
+
+        async with ledger.transaction(1, reason="buy") as txn:
+            txn.add_item(1, "mayo", 1)
+        ledger.close()
+        await flush
+
+    asyncio.run(run())
+
+    assert storage.commits == [{"1": {"mayo": 1}}, {"1": {"mayo": 2}}]
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from datetime import datetime
+
+from util import trading_calendar
+from util.scheduler import MARKET_TIMEZONE, DailyJob, MarketScheduler
+
+
+def _at(*args) -> datetime:
+    return MARKET_TIMEZONE.localize(datetime(*args))
+
+
+class Recorder():
+    """Job callback noting the occurrences it ran for."""
+    def __init__(self, name: str, runs: list):
+        self.name = name
+        self.runs = runs
+
+    async def __call__(self, when):
+        self.runs.append((self.name, when))
+
+
+def _scheduler(tmp_path, now: datetime, last_runs: dict = None, catch_up: bool = True):
+    state_path = tmp_path / "scheduler_state.json"
+    if last_runs is not None:
+        state_path.write_text(json.dumps(last_runs))
+
+    runs = []
+    scheduler = MarketScheduler(str(state_path))
+    scheduler.now = lambda: now
+    scheduler.add_job(DailyJob("market_open", Recorder("market_open", runs), trading_calendar.market_open, catch_up))
+    scheduler.add_job(DailyJob("market_close", Recorder("market_close", runs), trading_calendar.market_close, catch_up))
+    return scheduler, runs
+
+
+def test_first_start_records_without_running(tmp_path):
+    # Monday before the open, the last occurrences are Friday's
+    scheduler, runs = _scheduler(tmp_path, _at(2026, 10, 19, 8, 0))
+    asyncio.run(scheduler._fire_due())
+
+    assert runs == []
+    state = json.loads((tmp_path / "scheduler_state.json").read_text())
+    assert state == {"market_open": "2026-10-16", "market_close": "2026-10-16"}
+
+
+def test_missed_occurrences_are_caught_up_once_oldest_first(tmp_path):
+    # Offline since Wednesday, Thursday and Friday were missed
+    last_runs = {"market_open": "2026-10-14", "market_close": "2026-10-14"}
+    scheduler, runs = _scheduler(tmp_path, _at(2026, 10, 19, 8, 0), last_runs)
+    asyncio.run(scheduler._fire_due())
+
+    # Only the last missed one, for the day it was missed on
+    assert runs == [("market_open", _at(2026, 10, 16, 9, 30)), ("market_close", _at(2026, 10, 16, 16, 0))]
+
+
+def test_jobs_without_catch_up_are_skipped_on_start(tmp_path):
+    last_runs = {"market_open": "2026-10-14", "market_close": "2026-10-14"}
+    scheduler, runs = _scheduler(tmp_path, _at(2026, 10, 19, 8, 0), last_runs, catch_up=False)
+    asyncio.run(scheduler._fire_due())
+
+    assert runs == []
+
+
+def test_a_job_runs_once_per_day(tmp_path):
+    last_runs = {"market_open": "2026-10-16", "market_close": "2026-10-16"}
+    scheduler, runs = _scheduler(tmp_path, _at(2026, 10, 19, 9, 30), last_runs)
+
+    async def run():
+        await scheduler._fire_due(since=_at(2026, 10, 19, 9, 0))
+        await scheduler._fire_due(since=_at(2026, 10, 19, 9, 0))
+        await scheduler._fire_due()
+
+    asyncio.run(run())
+    assert runs == [("market_open", _at(2026, 10, 19, 9, 30))]
+
+    # Saved before the callback ran, a restart on the same day doesn't run it again
+    restarted, runs = _scheduler(tmp_path, _at(2026, 10, 19, 9, 45))
+    asyncio.run(restarted._fire_due())
+    assert runs == []
+
+
+def test_occurrences_at_or_before_since_are_left_alone(tmp_path):
+    last_runs = {"market_open": "2026-10-16", "market_close": "2026-10-16"}
+    scheduler, runs = _scheduler(tmp_path, _at(2026, 10, 19, 9, 45), last_runs)
+    asyncio.run(scheduler._fire_due(since=_at(2026, 10, 19, 9, 30)))
+
+    assert runs == []
+
+
+def test_no_occurrence_on_holidays(tmp_path):
+    scheduler, _ = _scheduler(tmp_path, _at(2026, 11, 26, 12, 0))
+
+    # Thanksgiving, then the early close the day after
+    assert scheduler.next_run(scheduler.jobs["market_open"], _at(2026, 11, 26, 0, 0)) == _at(2026, 11, 27, 9, 30)
+    assert scheduler.next_run(scheduler.jobs["market_close"], _at(2026, 11, 26, 0, 0)) == _at(2026, 11, 27, 13, 0)
@@ -0,0 +1,23 @@
+from util.scoring import PredictionSet
+
+
+def _predictions(*values):
+    return PredictionSet.from_records(
+        [{"user": user_id, "prediction": value, "method": "dd"} for user_id, value in enumerate(values, 1)]
+    )
+
+
+def test_equal_predictions_share_a_rank_across_equal_distances():
+    # 99 and 101 are both 1 away from 100, the two 99s must not be split by the 101
+    scores = _predictions(99.0, 101.0, 99.0).score(100.0)
+
+    assert [(user_id, rank) for user_id, _, _, _, rank in scores.rows()] == [(1, 1), (3, 1), (2, 2)]
+    assert [(user_id, award) for user_id, _, _, award in scores.payouts()] == [(1, "first"), (3, "first"),
+                                                                               (2, "second")]
+
+
+def test_lower_prediction_wins_a_tie_like_the_standings():
+    scores = _predictions(101.0, 99.0).score(100.0)
+
+    assert [user_id for user_id, *_ in scores.rows()] == [2, 1]
+    assert [rank for *_, rank in scores.rows()] == [1, 2]
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import util.storage
+from util.ledger import BankLedger
+from util.storage import JsonStorage
+
+
+def _storage(tmp_path, compact_bytes=1024 * 1024):
+    return JsonStorage(str(tmp_path), compact_bytes=compact_bytes)
+
+
+def test_journal_is_replayed_on_load(tmp_path):
+    storage = _storage(tmp_path)
+    storage.commit_accounts(["1"], {"1": 100}, {})
+    storage.commit_accounts([], {"1": -30, "2": 5}, {"2": {"mayo": 2}})
+
+    # Nothing compacted yet, everything comes out of the journal
+    assert not os.path.exists(storage.bank_path)
+    assert _storage(tmp_path).load_accounts() == {
+        "1": {"wallet": 70},
+        "2": {"wallet": 5, "inventory": {"mayo": 2}},
+    }
+
+
+def test_torn_tail_is_trimmed_and_skipped(tmp_path):
+    storage = _storage(tmp_path)
+    storage.commit_accounts(["1"], {"1": 100}, {})
+    # A crash halfway through the next append, without the compaction close() would do
+    with open(storage.bank_journal_path, 'a') as f:
+        f.write('{"accounts": {"1": {"wall')
+
+    storage = _storage(tmp_path)
+    assert storage.load_accounts() == {"1": {"wallet": 100}}
+
+    # The next append starts on a line of its own
+    storage.commit_accounts([], {"1": 1}, {})
+    with open(storage.bank_journal_path, 'r') as f:
+        assert [json.loads(line)["accounts"] for line in f] == [{"1": {"wallet": 100}}, {"1": {"wallet": 101}}]
+    assert _storage(tmp_path).load_accounts() == {"1": {"wallet": 101}}
+
+
+def test_compaction_writes_the_snapshot_and_empties_the_journal(tmp_path):
+    storage = _storage(tmp_path, compact_bytes=200)
+    for _ in range(10):
+        storage.commit_accounts([], {"1": 10}, {})
+
+    with open(storage.bank_path, 'r') as f:
+        snapshot = json.load(f)
+    assert snapshot["1"]["wallet"] <= 100
+    assert os.path.getsize(storage.bank_journal_path) < 200
+    assert _storage(tmp_path).load_accounts() == {"1": {"wallet": 100}}
+
+
+def test_close_compacts(tmp_path):
+    storage = _storage(tmp_path)
+    storage.commit_accounts(["1"], {"1": 42}, {})
+    storage.close()
+
+    assert os.path.getsize(storage.bank_journal_path) == 0
+    with open(storage.bank_path, 'r') as f:
+        assert json.load(f) == {"1": {"wallet": 42}}
+
+
+def test_failed_commit_is_retried_without_counting_twice(tmp_path, monkeypatch):
+    storage = _storage(tmp_path)
+    ledger = BankLedger(storage, flush_delay=3600)
+
+    real_fsync = os.fsync
+    failures = [OSError("disk full")]
+
+    def fsync(fd):
+        if failures:
+            raise failures.pop()
+        real_fsync(fd)
+
+    monkeypatch.setattr(util.storage.os, "fsync", fsync)
+
+    async def run():
+        ledger.update_wallet(4, 50, "beg")
+        await ledger.flush()  # fails, the changes go back to pending
+        assert ledger.dirty
+        await ledger.flush()
+        ledger.close()
+
+    asyncio.run(run())
+
+    assert ledger.get_balance(4) == 50
+    storage.close()
+    assert _storage(tmp_path).load_accounts()["4"]["wallet"] == 50
+
+
+def test_failed_commit_leaves_no_partial_line(tmp_path, monkeypatch):
+    storage = _storage(tmp_path)
+    storage.commit_accounts(["1"], {"1": 1}, {})
+    size = os.path.getsize(storage.bank_journal_path)
+
+    def fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(util.storage.os, "fsync", fsync)
+    with pytest.raises(OSError):
+        storage.commit_accounts([], {"1": 1}, {})
+    monkeypatch.undo()
+
+    assert os.path.getsize(storage.bank_journal_path) == size
+    storage.commit_accounts([], {"1": 1}, {})
+    assert _storage(tmp_path).load_accounts() == {"1": {"wallet": 2}}
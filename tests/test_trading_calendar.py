@@ -0,0 +1,70 @@
+from datetime import date, datetime, time
+
+from util import trading_calendar
+
+
+def test_fixed_rule_holidays():
+    for day in (date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 5, 27), date(2024, 7, 4),
+                date(2024, 9, 2), date(2024, 11, 28), date(2024, 12, 25)):
+        assert not trading_calendar.is_trading_day(day), day
+
+
+def test_good_friday():
+    assert trading_calendar.holiday_name(date(2021, 4, 2)) == "Good Friday"
+    assert trading_calendar.holiday_name(date(2022, 4, 15)) == "Good Friday"
+    assert trading_calendar.holiday_name(date(2024, 3, 29)) == "Good Friday"
+
+
+def test_weekend_holidays_are_observed_on_the_nearest_weekday():
+    # Independence Day on a saturday (2020) and on a sunday (2021)
+    assert trading_calendar.holiday_name(date(2020, 7, 3)) == "Independence Day"
+    assert trading_calendar.holiday_name(date(2021, 7, 5)) == "Independence Day"
+    # Christmas Day on a sunday (2022)
+    assert trading_calendar.holiday_name(date(2022, 12, 26)) == "Christmas Day"
+    assert trading_calendar.is_trading_day(date(2022, 12, 23))
+
+
+def test_new_years_day_on_a_saturday_is_not_observed():
+    assert trading_calendar.is_trading_day(date(2021, 12, 31))
+    assert trading_calendar.is_trading_day(date(2022, 1, 3))
+    # ... but on a sunday it moves to monday
+    assert trading_calendar.holiday_name(date(2023, 1, 2)) == "New Year's Day"
+
+
+def test_juneteenth_from_2022_on():
+    assert trading_calendar.is_trading_day(date(2021, 6, 18))
+    assert trading_calendar.holiday_name(date(2022, 6, 20)) == "Juneteenth National Independence Day"
+    assert not trading_calendar.is_trading_day(date(2023, 6, 19))
+
+
+def test_special_closures():
+    assert not trading_calendar.is_trading_day(date(2012, 10, 29))
+    assert not trading_calendar.is_trading_day(date(2025, 1, 9))
+
+
+def test_early_closes():
+    for day in (date(2021, 11, 26), date(2023, 7, 3), date(2024, 7, 3), date(2024, 12, 24)):
+        assert trading_calendar.market_close(day) == time(13, 0), day
+
+    # Christmas Day 2021 was observed on christmas eve, and July 3 2020 was the observed Independence Day
+    assert trading_calendar.market_close(date(2021, 12, 24)) is None
+    assert trading_calendar.market_close(date(2020, 7, 3)) is None
+    assert trading_calendar.market_close(date(2020, 7, 2)) == time(16, 0)
+
+
+def test_next_and_previous_trading_day_skip_weekends_and_holidays():
+    assert trading_calendar.next_trading_day(date(2024, 3, 28)) == date(2024, 4, 1)
+    assert trading_calendar.previous_trading_day(date(2024, 4, 1)) == date(2024, 3, 28)
+
+
+def test_last_session_starts_with_the_pre_market():
+    assert trading_calendar.last_session(datetime(2024, 4, 1, 3, 59)) == date(2024, 3, 28)
+    assert trading_calendar.last_session(datetime(2024, 4, 1, 4, 0)) == date(2024, 4, 1)
+    assert trading_calendar.last_session(datetime(2024, 3, 30, 12, 0)) == date(2024, 3, 28)
+
+
+def test_is_session_open():
+    assert not trading_calendar.is_session_open(datetime(2024, 11, 29, 9, 29))
+    assert trading_calendar.is_session_open(datetime(2024, 11, 29, 9, 30))
+    assert not trading_calendar.is_session_open(datetime(2024, 11, 29, 13, 0))
+    assert trading_calendar.is_session_open(datetime(2024, 12, 2, 15, 59))
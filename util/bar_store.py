@@ -0,0 +1,263 @@
+import json
+import logging as log
+import os
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from util import trading_calendar
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+BAR_DTYPE = np.dtype([("times", "datetime64[ns]"), *((column, np.float64) for column in COLUMNS)])
+
+# How far back yahoo serves intraday bars, in days. Daily and longer intervals go back to the IPO
+FETCH_WINDOW_DAYS = {
+    "1m": 7,
+    "2m": 59,
+    "5m": 59,
+    "15m": 59,
+    "30m": 59,
+    "60m": 729,
+    "90m": 59,
+    "1h": 729,
+}
+
+
+def period_start(period: str, today: date):
+    """First date a yfinance period covers as of today. None for "max", KeyError for periods it doesn't know."""
+    if period == "max":
+        return None
+    if period == "ytd":
+        return date(today.year, 1, 1)
+
+    amount, unit = int(period[:-2] if period.endswith("mo") else period[:-1]), period[-2:]
+    if unit.endswith("d"):
+        # Trading days, the last one being today (or the last session when the exchange is closed)
+        day = today if trading_calendar.is_trading_day(today) else trading_calendar.previous_trading_day(today)
+        for _ in range(amount - 1):
+            day = trading_calendar.previous_trading_day(day)
+        return day
+    if unit == "mo":
+        return today - relativedelta(months=amount)
+    if unit.endswith("y"):
+        return today - relativedelta(years=amount)
+    raise KeyError(period)
+
+
+class Bars():
+    """
+        A range of OHLCV bars as numpy arrays. Coming from the BarStore they are views into a memory map,
+        nothing is copied until they are written to (they're read only) or sent elsewhere.
+
+        Attributes:
+            times: datetime64[ns], wall clock time of the exchange (the way the charts always showed them)
+            open, high, low, close, volume: float64
+    """
+    def __init__(self, symbol: str, interval: str, records):
+        self.symbol = symbol
+        self.interval = interval
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getattr__(self, column):
+        if column in BAR_DTYPE.names:
+            return self.records[column]
+        raise AttributeError(column)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.records) == 0
+
+    @classmethod
+    def from_frame(cls, symbol: str, interval: str, frame: pd.DataFrame):
+        """From a yfinance download of one symbol."""
+        if isinstance(frame.columns, pd.MultiIndex):
+            frame = frame.droplevel(1, axis=1)
+
+        index = frame.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_localize(None)
+
+        records = np.empty(len(frame), dtype=BAR_DTYPE)
+        records["times"] = index.to_numpy(dtype="datetime64[ns]")
+        for column in COLUMNS:
+            name = column.capitalize()
+            records[column] = frame[name].to_numpy(dtype=np.float64) if name in frame else 0.0
+        return cls(symbol, interval, records)
+
+
+class BarStore():
+    """
+        Price history on disk, one .npy file of OHLCV records per (symbol, interval), memory mapped for reading.
+        A refresh only downloads the bars from the last stored one on and merges them in.
+        The files take max_bytes at most, the series refreshed least recently are deleted first.
+
+        Examples:
+        store = BarStore(f"{constants.FilePaths.STORAGE_PATH}{os.sep}bars", max_bytes=256 * 1024 * 1024)
+        store.update("GME", "1h", fetch, start=date(2021, 1, 4), period="3mo")  # fetch(start, period) -> DataFrame
+        bars = store.read("GME", "1h", date(2021, 1, 4))
+        bars.close  # view of the map, no copy
+
+        Note:
+        A merge writes a new file and renames it over the old one, the maps handed out earlier stay valid.
+        The last stored bar is always fetched again, it may still have been forming when it was stored.
+    """
+    def __init__(self, path: str, max_bytes: int = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._maps = {}
+        self._locks = {}
+
+    def _file(self, symbol: str, interval: str) -> str:
+        return f"{self.path}{os.sep}{symbol.replace(os.sep, '_')}_{interval}"
+
+    def _records(self, symbol: str, interval: str):
+        key = (symbol, interval)
+        records = self._maps.get(key)
+        if records is None:
+            try:
+                records = np.load(f"{self._file(symbol, interval)}.npy", mmap_mode='r')
+            except (FileNotFoundError, ValueError):
+                return None
+            self._maps[key] = records
+        return records
+
+    def _meta(self, symbol: str, interval: str) -> dict:
+        try:
+            with open(f"{self._file(symbol, interval)}.json", 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def covers(self, symbol: str, interval: str, start) -> bool:
+        """Whether the store has everything from start on (start None meaning everything there is)."""
+        records = self._records(symbol, interval)
+        if records is None or len(records) == 0:
+            return False
+
+        meta = self._meta(symbol, interval)
+        if start is None or meta.get("max"):
+            return bool(meta.get("max"))
+        # Older bars than the first one we have may not exist (IPO, yahoos' intraday limits)
+        return records["times"][0] <= np.datetime64(start, 'ns') or meta.get("first_requested", "9999") <= str(start)
+
+    def read(self, symbol: str, interval: str, start=None) -> Bars:
+        """Bars from start (a date, or None for all of them) to the last stored one, as a view of the map."""
+        records = self._records(symbol, interval)
+        if records is None:
+            return Bars(symbol, interval, np.empty(0, dtype=BAR_DTYPE))
+
+        first = 0 if start is None else int(np.searchsorted(records["times"], np.datetime64(start, 'ns')))
+        return Bars(symbol, interval, records[first:])
+
+    def read_last_session(self, symbol: str, interval: str) -> Bars:
+        """Bars of the day of the last stored bar, a view of the map like read()."""
+        records = self._records(symbol, interval)
+        if records is None or len(records) == 0:
+            return Bars(symbol, interval, np.empty(0, dtype=BAR_DTYPE))
+        return self.read(symbol, interval, records["times"][-1].astype('datetime64[D]'))
+
+    def update(self, symbol: str, interval: str, fetch, start=None, period: str = None):
+        """Brings (symbol, interval) up to date from start on. Blocking, run it on a worker thread.
+
+        Args:
+            fetch: fetch(start=None, period=None) -> DataFrame, downloads from a start date or for a period
+            start: first date that has to be there, None for the whole history ("max")
+            period: the yfinance period start stands for, used when the stored bars are too old to continue
+        """
+        with self._locks.setdefault((symbol, interval), threading.Lock()):
+            records = self._records(symbol, interval)
+            meta = self._meta(symbol, interval)
+            self._touch(symbol, interval)
+
+            window = FETCH_WINDOW_DAYS.get(interval)
+            last_day = pd.Timestamp(records["times"][-1]).date() if records is not None and len(records) else None
+            if last_day is not None and window and (date.today() - last_day).days >= window:
+                # Yahoo doesn't serve intraday bars from that far back, the gap can't be filled. Start over
+                frame = fetch(period=period) if period else fetch(start=start, period=None if start else "max")
+                fresh = Bars.from_frame(symbol, interval, frame).records
+                records = None
+                meta = {"first_requested": str(start)} if start else {}
+            elif self.covers(symbol, interval, start):
+                fresh = Bars.from_frame(symbol, interval, fetch(start=last_day)).records
+            else:
+                fresh = Bars.from_frame(symbol, interval, fetch(start=start, period=None if start else "max")).records
+                if start is None:
+                    meta["max"] = True
+                elif str(start) < meta.get("first_requested", "9999"):
+                    meta["first_requested"] = str(start)
+
+            if len(fresh) == 0:
+                return
+            self._write(symbol, interval, self._merge(records, fresh), meta)
+
+    @staticmethod
+    def _merge(records, fresh):
+        """Fresh bars replace the stored ones in their time range, the stored ones around it are kept."""
+        if records is None or len(records) == 0:
+            return fresh
+
+        times = records["times"]
+        before = int(np.searchsorted(times, fresh["times"][0]))
+        after = int(np.searchsorted(times, fresh["times"][-1], side='right'))
+        return np.concatenate((records[:before], fresh, records[after:]))
+
+    def _write(self, symbol: str, interval: str, records, meta: dict):
+        os.makedirs(self.path, exist_ok=True)
+        path = self._file(symbol, interval)
+
+        np.save(f"{path}.tmp.npy", records)
+        os.replace(f"{path}.tmp.npy", f"{path}.npy")
+        with open(f"{path}.json.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+
+        self._maps.pop((symbol, interval), None)
+        log.debug(f"BarStore {symbol} {interval}: {len(records)} bars")
+        if self.max_bytes is not None:
+            self._evict(keep=path)
+
+    def _touch(self, symbol: str, interval: str):
+        """Marks the series as used, eviction goes by the modification time of its .json."""
+        try:
+            os.utime(f"{self._file(symbol, interval)}.json")
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: str):
+        """Deletes the least recently used series until the store fits max_bytes again, never keep."""
+        series = []
+        total = 0
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".npy") or entry.name.endswith(".tmp.npy"):
+                    continue
+                base = entry.path[:-len(".npy")]
+                size = entry.stat().st_size
+                total += size
+                try:
+                    used = os.stat(f"{base}.json").st_mtime
+                except FileNotFoundError:
+                    used = 0.0
+                series.append((used, base, size))
+
+        for used, base, size in sorted(series):
+            if total <= self.max_bytes:
+                break
+            if base == keep:
+                continue
+            for suffix in (".npy", ".json"):
+                try:
+                    os.remove(f"{base}{suffix}")
+                except FileNotFoundError:
+                    pass
+            total -= size
+            # Maps handed out before stay readable, the file is only gone from the directory
+            for key in [key for key in self._maps if self._file(*key) == base]:
+                del self._maps[key]
+            log.info(f"BarStore evicted {os.path.basename(base)}")
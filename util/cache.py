@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache():
+    """
+        LRU cache whose entries expire after a time to live. Concurrent misses for the same key share one fetch.
+
+        Examples:
+        cache = TTLCache(max_entries=256, ttl=60)
+        data = await cache.get_or_fetch(("gme", "5d", "1h"), lambda: client.download("gme", "5d", "1h"), ttl=300)
+
+        Note:
+        Failed fetches are not cached, every waiter of that fetch gets the exception.
+    """
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not MISSING
+
+    def get(self, key, default=MISSING):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_fetch(self, key, fetch, ttl: float = None):
+        """Returns the cached value for key, or awaits fetch() once for everybody asking while it runs.
+
+        Args:
+            key: any hashable
+            fetch: callable returning an awaitable of the value
+            ttl: overrides the cache wide time to live for this entry
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch(key, fetch, ttl))
+            self._inflight[key] = task
+        else:
+            self.hits += 1
+
+        # Shielded, so one impatient caller getting cancelled doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, fetch, ttl):
+        try:
+            value = await fetch()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            del self._inflight[key]
+
+
+class ByteLRUCache():
+    """
+        LRU cache for bytes values, bounded by the total size of the values instead of the number of entries.
+
+        Examples:
+        cache = ByteLRUCache(max_bytes=32 * 1024 * 1024)
+        cache.set(("GME", "5d", "1h", last_bar), png)
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=MISSING):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+
+        self._entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
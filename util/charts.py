@@ -0,0 +1,150 @@
+import asyncio
+import io
+import logging as log
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import matplotlib.style
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+def render_price_chart(title: str, dates, closes, xlabel: str = "Date", ylabel: str = "Close") -> bytes:
+    """Draws a line chart of closes over dates and returns it as PNG bytes.
+
+    Note:
+        Uses its own Figure instead of the pyplot state machine, so any number of these can run side by side.
+    """
+    with matplotlib.style.context('dark_background'):
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.plot(dates, closes, color='#47a0ff')
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        fig.autofmt_xdate()
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', transparent=True)
+
+    return buffer.getvalue()
+
+
+def render_comparison_chart(title: str, lines, xlabel: str = "Date", ylabel: str = "Change %") -> bytes:
+    """Draws several (label, dates, closes) lines as their change in % since their first close, with a legend.
+    Symbols at $5 and at $500 end up on the same scale that way."""
+    with matplotlib.style.context('dark_background'):
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        for label, dates, closes in lines:
+            if len(closes) == 0:
+                continue
+            ax.plot(dates, (closes / closes[0] - 1) * 100, label=label)
+        ax.axhline(0, color='grey', linewidth=0.5)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        ax.legend()
+        fig.autofmt_xdate()
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', transparent=True)
+
+    return buffer.getvalue()
+
+
+def lttb(x, y, threshold: int):
+    """Largest-triangle-three-buckets: the threshold points of (x, y) that keep the shape of the line.
+
+    The first and last point are kept, the rest is split into threshold - 2 buckets and from each the point
+    spanning the largest triangle with the point kept before it and the average of the next bucket is kept.
+    Peaks and dips survive, unlike with plain decimation. x may be datetime64, NaNs in y are dropped.
+    Returns x and y unchanged if there are threshold points or fewer.
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x)
+    finite = ~np.isnan(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    xs = x.astype('datetime64[ns]').view(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x
+    xs = xs.astype(float)
+    # threshold - 2 buckets between the first and the last point, at least one point each
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = xs[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Twice the triangle areas, the factor doesn't change which one is largest
+        area = np.abs((xs[a] - avg_x) * (y[start:end] - y[a]) - (xs[a] - xs[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return x[selected], y[selected]
+
+
+class ChartRenderer():
+    """
+        Renders charts on a pool of worker processes, matplotlib holds the GIL while it draws.
+
+        Examples:
+        renderer = ChartRenderer()
+        bars = await market_data.get_bars("gme", period="5d", interval="1h")
+        png = await renderer.price_chart("$GME Price data", bars.times, bars.close)
+        image = discord.File(io.BytesIO(png), filename='graph.png')
+
+        Note:
+        Workers are forked (the bot script can't be re-imported by a spawned child, it would start a second bot).
+        Series longer than max_points are downsampled with lttb first, a chart can't show more points than it
+        is pixels wide, and this way drawing "max 1d" costs about the same as "5d 1h".
+        A render taking longer than timeout seconds raises asyncio.TimeoutError. If a worker dies the pool is
+        broken for good, it's replaced with a new one so the next chart works again.
+    """
+    def __init__(self, max_workers: int = 2, max_points: int = 640, timeout: float = 30):
+        self.max_workers = max_workers
+        self.max_points = max_points
+        self.timeout = timeout
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('fork'))
+
+    async def _render(self, function, *args) -> bytes:
+        loop = asyncio.get_event_loop()
+        executor = self._executor
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(executor, function, *args), self.timeout)
+        except BrokenProcessPool:
+            # Another render may have replaced it already
+            if self._executor is executor:
+                log.error("Chart worker died, starting a new pool")
+                executor.shutdown(wait=False)
+                self._executor = self._new_executor()
+            raise
+
+    async def price_chart(self, title: str, dates, closes) -> bytes:
+        dates, closes = lttb(dates, closes, self.max_points)
+        return await self._render(render_price_chart, title, dates, closes)
+
+    async def comparison_chart(self, title: str, lines) -> bytes:
+        """lines: (label, dates, closes) per symbol, see render_comparison_chart."""
+        lines = [(label, *lttb(dates, closes, self.max_points)) for label, dates, closes in lines]
+        return await self._render(render_comparison_chart, title, lines)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,50 @@
+from util.ranking import Ranking
+from util.storage import AWARD_KEYS, Storage
+
+
+class PredictionLeaderboard():
+    """
+        Resident copy of the prediction leaderboard, ranked by prize total. Awards are written through to the
+        storage and applied to the ranking in place, reading the top of the board never touches the storage.
+
+        Examples:
+        leaderboard = PredictionLeaderboard(get_storage())
+        leaderboard.add_awards([(user.id, 1000, "first")], participants=[user.id])
+        for rank, user_id, prize_total in leaderboard.top(10):
+            awards = leaderboard.users[user_id]["awards"]
+
+        Note:
+        `version` changes with every write, anything rendered from the board can be cached against it.
+    """
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self.version = 0
+        self.users = storage.load_leaderboard()
+        self.ranking = Ranking({user_id: user["prize_total"] for user_id, user in self.users.items()})
+
+    def __len__(self):
+        return len(self.users)
+
+    def top(self, k: int):
+        return self.ranking.top(k)
+
+    def _user(self, user_id) -> dict:
+        key = str(user_id)
+        user = self.users.get(key)
+        if user is None:
+            user = self.users[key] = {"prize_total": 0, "awards": {award: 0 for award in AWARD_KEYS}}
+            self.ranking.update(key, 0)
+        return user
+
+    def add_awards(self, awards: list, participants=()):
+        """Adds (user_id, prize, award) tuples, with one write to the storage. See Storage.add_leaderboard_awards"""
+        self.storage.add_leaderboard_awards(awards, participants=participants)
+
+        for user_id in participants:
+            self._user(user_id)
+        for user_id, prize, award in awards:
+            user = self._user(user_id)
+            user["prize_total"] += prize
+            user["awards"][award] += 1
+            self.ranking.update(str(user_id), user["prize_total"])
+        self.version += 1
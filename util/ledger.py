@@ -0,0 +1,326 @@
+import asyncio
+import atexit
+import copy
+import logging as log
+import threading
+import weakref
+
+from util.ranking import Ranking
+from util.storage import Storage
+
+
+class LedgerError(Exception):
+    """Raised inside a transaction to abort it, nothing that was staged gets applied."""
+
+    def __init__(self, user_id, message: str):
+        super().__init__(message)
+        self.user_id = user_id
+
+
+class InsufficientFunds(LedgerError):
+    def __init__(self, user_id, balance):
+        super().__init__(user_id, f"{user_id} only has ${balance}")
+        self.balance = balance
+
+
+class InsufficientItems(LedgerError):
+    def __init__(self, user_id, item, owned):
+        super().__init__(user_id, f"{user_id} only has {owned} {item}")
+        self.item = item
+        self.owned = owned
+
+
+class Transaction():
+    """
+        A group of wallet and inventory changes on a few accounts, applied all at once or not at all.
+        Get one from BankLedger.transaction(), reads see the changes staged so far.
+    """
+    def __init__(self, ledger, user_ids, reason: str = None):
+        self.ledger = ledger
+        self.user_ids = user_ids
+        self.reason = reason
+        self._wallet_changes = {}
+        self._item_changes = {}
+
+    def _check_user(self, user_id):
+        key = str(user_id)
+        if key not in self.user_ids:
+            raise KeyError(f"Account {key} is not part of this transaction")
+        return key
+
+    def balance(self, user_id):
+        key = self._check_user(user_id)
+        return self.ledger.get_balance(key) + self._wallet_changes.get(key, 0)
+
+    def quantity(self, user_id, item: str) -> int:
+        key = self._check_user(user_id)
+        return self.ledger.get_inventory(key).get(item, 0) + self._item_changes.get((key, item), 0)
+
+    def add_wallet(self, user_id, change):
+        """Stages a wallet change, raises InsufficientFunds if it would take the wallet below zero."""
+        key = self._check_user(user_id)
+        balance = self.balance(key)
+        if balance + change < 0:
+            raise InsufficientFunds(key, balance)
+        self._wallet_changes[key] = self._wallet_changes.get(key, 0) + change
+
+    def add_item(self, user_id, item: str, amount: int):
+        """Stages an inventory change, raises InsufficientItems if more would be taken out than is owned."""
+        key = self._check_user(user_id)
+        owned = self.quantity(key, item)
+        if owned + amount < 0:
+            raise InsufficientItems(key, item, owned)
+        self._item_changes[(key, item)] = self._item_changes.get((key, item), 0) + amount
+
+    def _apply(self):
+        # No awaits in here, so nobody can observe a half applied transaction
+        for key, change in self._wallet_changes.items():
+            self.ledger.update_wallet(key, change, self.reason)
+
+        for (key, item), amount in self._item_changes.items():
+            self.ledger.record(key, self.reason, item=item, amount=amount)
+            inventory = self.ledger.get_account(key).setdefault("inventory", {})
+            owned = inventory.get(item, 0) + amount
+            if owned:
+                inventory[item] = owned
+            else:
+                inventory.pop(item, None)
+            self.ledger.mark_dirty(key)
+
+
+class _TransactionContext():
+    def __init__(self, ledger, user_ids, reason):
+        self.ledger = ledger
+        self.reason = reason
+        # Always lock in the same order, two transactions over the same accounts can't deadlock
+        self.user_ids = sorted({str(user_id) for user_id in user_ids})
+        self.locks = [ledger._lock_for(key) for key in self.user_ids]
+        self.transaction = None
+
+    async def __aenter__(self) -> Transaction:
+        acquired = []
+        try:
+            for lock in self.locks:
+                await lock.acquire()
+                acquired.append(lock)
+        except BaseException:
+            for lock in acquired:
+                lock.release()
+            raise
+
+        for key in self.user_ids:
+            self.ledger.open_account(key)
+        self.transaction = Transaction(self.ledger, self.user_ids, self.reason)
+        return self.transaction
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.transaction._apply()
+        finally:
+            for lock in self.locks:
+                lock.release()
+        return False
+
+
+class BankLedger():
+    """
+        Resident copy of the bank accounts. Reads are served from memory, writes are recorded as pending changes
+        and handed to the storage backend by a debounced flush on a background task.
+        `wealth` ranks the accounts by wallet and is updated with every balance change.
+
+        Examples:
+        ledger = BankLedger(get_storage())
+        ledger.open_account(user.id)
+        bal = ledger.update_wallet(user.id, 50, "beg")
+
+        Note:
+        Call close() when the owner goes away (cog unload), it cancels the pending flush and writes
+        everything that is still dirty. An atexit hook covers the process being torn down without an unload.
+        Flushes commit one at a time in the order they took their changes. Inventories go to the storage as
+        complete snapshots, an older one committed last would overwrite a newer one.
+    """
+    def __init__(self, storage: Storage, flush_delay: float = 5.0):
+        self.storage = storage
+        self.flush_delay = flush_delay
+        self.accounts = storage.load_accounts()
+        self._created = set()
+        self._wallet_deltas = {}
+        self._dirty_inventories = set()
+        self._mutations = []
+        self._flush_task = None
+        # _flush_lock lines up the async flushes, _commit_lock is held from taking the changes until the storage
+        # has them, so flush_now waits for a commit still running on the executor
+        self._flush_lock = asyncio.Lock()
+        self._commit_lock = threading.Lock()
+        self._migrate_inventories()
+        self.wealth = Ranking({key: account["wallet"] for key, account in self.accounts.items()})
+        self._locks = weakref.WeakValueDictionary()
+        atexit.register(self.flush_now)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._created or self._wallet_deltas or self._dirty_inventories)
+
+    def open_account(self, user_id) -> bool:
+        """Creates an empty account for the user. Returns False if the account already exists."""
+        key = str(user_id)
+        if key in self.accounts:
+            return False
+
+        self.accounts[key] = {"wallet": 0}
+        self.wealth.update(key, 0)
+        self._created.add(key)
+        self._schedule_flush()
+        return True
+
+    def get_account(self, user_id) -> dict:
+        self.open_account(user_id)
+        return self.accounts[str(user_id)]
+
+    def get_balance(self, user_id) -> int:
+        return self.get_account(user_id)["wallet"]
+
+    def get_inventory(self, user_id) -> dict:
+        """item -> amount owned. Read only, change it through a transaction."""
+        return self.get_account(user_id).get("inventory", {})
+
+    def _migrate_inventories(self):
+        # Inventories used to be lists of {"item", "amount"}, they are written back as maps with the next flush
+        for key, account in self.accounts.items():
+            inventory = account.get("inventory")
+            if isinstance(inventory, list):
+                migrated = {}
+                for thing in inventory:
+                    if thing["amount"]:
+                        migrated[thing["item"]] = migrated.get(thing["item"], 0) + thing["amount"]
+                account["inventory"] = migrated
+                self._dirty_inventories.add(key)
+
+    def update_wallet(self, user_id, change=0, reason: str = None) -> int:
+        """Adds change to the users' wallet and returns the new balance.
+        reason tags the change in the storage (e.g. "beg", "prize"), it has no effect on the balance."""
+        account = self.get_account(user_id)
+        if change:
+            key = str(user_id)
+            account["wallet"] += change
+            self.wealth.update(key, account["wallet"])
+            self._wallet_deltas[key] = self._wallet_deltas.get(key, 0) + change
+            self.record(key, reason, wallet=change)
+        return account["wallet"]
+
+    def credit(self, changes: dict, reason: str = "prize"):
+        """Adds user_id -> amount to many wallets at once, e.g. paying out prizes.
+        Nothing is awaited in between, so it lands as one batch in the next flush."""
+        for user_id, change in changes.items():
+            self.update_wallet(user_id, change, reason)
+
+    def record(self, user_id, reason: str, **change):
+        """Notes a mutation for the storage, see Storage.commit_accounts."""
+        self._mutations.append({"user": str(user_id), "reason": reason, **change})
+        self._schedule_flush()
+
+    def _lock_for(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    def transaction(self, *user_ids, reason: str = None) -> _TransactionContext:
+        """Locks the given accounts and stages changes on them, which are applied together when the block exits.
+
+        Examples:
+        async with ledger.transaction(sender.id, receiver.id, reason="send") as txn:
+            txn.add_wallet(sender.id, -69)
+            txn.add_wallet(receiver.id, 69)
+
+        Note:
+        Raising inside the block (e.g. the InsufficientFunds from add_wallet) discards every staged change.
+        """
+        return _TransactionContext(self, user_ids, reason)
+
+    def mark_dirty(self, user_id):
+        """Flags an account whose inventory was changed in place."""
+        self._dirty_inventories.add(str(user_id))
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_event_loop()
+        except RuntimeError:
+            return
+        if loop.is_running():
+            self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Hands the pending changes to the storage off the event loop, if anything changed since the last flush."""
+        async with self._flush_lock:
+            if not self.dirty:
+                return
+            # Never waits: the async flushes take turns, and flush_now runs on this thread
+            self._commit_lock.acquire()
+            changes = self._take_changes()
+            try:
+                commit = asyncio.get_event_loop().run_in_executor(None, self._commit, changes)
+            except BaseException:
+                self._commit_lock.release()
+                self._restore_changes(*changes)
+                raise
+            try:
+                # Shielded, a cancelled flush (cog unload) still lets the commit finish and release the lock
+                await asyncio.shield(commit)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"BankLedger flush failed: {e}")
+                self._restore_changes(*changes)
+                self._schedule_flush()
+
+    def _commit(self, changes):
+        """Runs on the executor, with _commit_lock acquired by flush."""
+        try:
+            self.storage.commit_accounts(*changes)
+        finally:
+            self._commit_lock.release()
+
+    def flush_now(self):
+        """Synchronous flush, used on unload and at interpreter exit. Waits for a flush that is still committing."""
+        with self._commit_lock:
+            if not self.dirty:
+                return
+            self.storage.commit_accounts(*self._take_changes())
+
+    def _take_changes(self):
+        created = list(self._created)
+        wallet_deltas = self._wallet_deltas
+        inventories = {key: copy.deepcopy(self.accounts[key].get("inventory", {})) for key in self._dirty_inventories}
+
+        mutations = self._mutations
+
+        self._created = set()
+        self._wallet_deltas = {}
+        self._dirty_inventories = set()
+        self._mutations = []
+        return created, wallet_deltas, inventories, mutations
+
+    def _restore_changes(self, created, wallet_deltas, inventories, mutations):
+        self._created.update(created)
+        for key, change in wallet_deltas.items():
+            self._wallet_deltas[key] = self._wallet_deltas.get(key, 0) + change
+        self._dirty_inventories.update(inventories)
+        self._mutations = mutations + self._mutations
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush_now()
+        atexit.unregister(self.flush_now)
@@ -0,0 +1,329 @@
+import asyncio
+import functools
+import logging as log
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import constants
+from util.bar_store import BarStore, Bars, period_start
+from util.cache import MISSING, TTLCache
+from util.options import OptionChain
+from util import trading_calendar
+from util.scheduler import MARKET_TIMEZONE
+
+
+# Intervals whose bars are dated at the start of a longer stretch (the first of the month for "1mo")
+LONG_INTERVALS = ("5d", "1wk", "1mo", "3mo")
+
+
+class MarketDataError(Exception):
+    pass
+
+
+class Quote():
+    """Open and latest close of a symbol for the current (or last) trading day."""
+
+    def __init__(self, symbol: str, open_price: float, close_price: float):
+        self.symbol = symbol
+        self.open = open_price
+        self.close = close_price
+
+    def __repr__(self):
+        return f"Quote({self.symbol}, open={self.open}, close={self.close})"
+
+
+class Fundamentals():
+    """
+        The few fields of yfinance's Ticker.info that ticker-info shows, None where yahoo has nothing.
+        info is a dict of a couple hundred keys (and a long business summary), this keeps a couple hundred bytes.
+    """
+    FIELDS = {
+        "name": "longName",
+        "short_name": "shortName",
+        "sector": "sector",
+        "industry": "industry",
+        "currency": "currency",
+        "market_cap": "marketCap",
+        "shares_outstanding": "sharesOutstanding",
+        "float_shares": "floatShares",
+        "short_percent_of_float": "shortPercentOfFloat",
+        "trailing_pe": "trailingPE",
+        "year_high": "fiftyTwoWeekHigh",
+        "year_low": "fiftyTwoWeekLow",
+        "website": "website",
+    }
+    SUMMARY_LENGTH = 300
+
+    __slots__ = ("symbol", "summary", *FIELDS)
+
+    def __init__(self, symbol: str, summary: str = None, **fields):
+        self.symbol = symbol
+        self.summary = summary
+        for field in self.FIELDS:
+            setattr(self, field, fields.get(field))
+
+    @classmethod
+    def from_info(cls, symbol: str, info: dict):
+        """None if yahoo doesn't know the symbol (its info then comes without any name)."""
+        if not info or not (info.get("longName") or info.get("shortName")):
+            return None
+
+        summary = info.get("longBusinessSummary")
+        if summary and len(summary) > cls.SUMMARY_LENGTH:
+            summary = summary[:cls.SUMMARY_LENGTH].rsplit(" ", 1)[0] + "..."
+        return cls(symbol, summary, **{field: info.get(key) for field, key in cls.FIELDS.items()})
+
+    def __repr__(self):
+        return f"Fundamentals({self.symbol}, {self.name or self.short_name})"
+
+
+class MarketDataClient():
+    """
+        Async front for yfinance. yfinance does blocking HTTP, so every fetch runs on a small thread pool
+        and the coroutine awaiting it stays cancellable and gives up after `timeout` seconds.
+
+        Examples:
+        market_data = get_market_data()
+        quote = await market_data.get_quote("gme")
+        quotes = await market_data.get_quotes(["gme", "amc", "bb"])  # one request to yahoo
+        data = await market_data.get_history("gme", period="5d", interval="1h")
+
+        Note:
+        A fetch that times out or gets cancelled before a worker picked it up is dropped from the queue.
+        One that already started keeps the worker until yfinance returns, its result is thrown away.
+        Histories are cached per (symbol, period, interval) for history_ttl[interval] seconds,
+        a burst of identical lookups makes a single request to yahoo.
+        With a bar_store, get_bars keeps the bars on disk and only asks yahoo for the ones it doesn't have yet.
+        Option chains are cached for option_ttl seconds and at most option_concurrency of them download at once.
+        Fundamentals are cached for fundamentals_ttl seconds, the fundamentals_size most recently asked for symbols.
+    """
+    def __init__(self, max_workers: int = 4, timeout: float = 15.0, cache_size: int = 256, history_ttl: dict = None,
+                 default_ttl: float = 60.0, bar_store: BarStore = None, option_ttl: float = 300.0,
+                 expiry_ttl: float = 3600.0, option_concurrency: int = 2, fundamentals_size: int = 512,
+                 fundamentals_ttl: float = 6 * 60 * 60):
+        self.timeout = timeout
+        self.history_ttl = history_ttl or {}
+        self.history_cache = TTLCache(max_entries=cache_size, ttl=default_ttl)
+        self.bar_store = bar_store
+        # (symbol, interval, start) -> None, for as long as the stored bars count as fresh
+        self.bar_refresh = TTLCache(max_entries=cache_size, ttl=default_ttl)
+        self.option_ttl = option_ttl
+        self.expiry_ttl = expiry_ttl
+        self.option_cache = TTLCache(max_entries=cache_size, ttl=option_ttl)
+        self._option_slots = asyncio.Semaphore(option_concurrency)
+        self.fundamentals_cache = TTLCache(max_entries=fundamentals_size, ttl=fundamentals_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="market-data")
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            log.error(f"market data fetch {func.__name__}{args} timed out after {self.timeout}s")
+            raise MarketDataError(f"Yahoo didn't answer within {self.timeout} seconds")
+
+    @staticmethod
+    def _download(symbol, period, interval, start=None, threads=False):
+        # https://pypi.org/project/yfinance/
+        return yf.download(  # or pdr.get_data_yahoo(...
+            # tickers list or string as well
+            tickers=symbol,
+
+            # use "period" instead of start/end
+            # valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
+            # (optional, default is '1mo')
+            period=None if start else period,
+
+            # download from this date on instead, used to only fetch the bars we don't have yet
+            start=start,
+
+            # fetch data by interval (including intraday if period < 60 days)
+            # valid intervals: 1m,2m,5m,15m,30m,60m,90m,1h,1d,5d,1wk,1mo,3mo
+            # (optional, default is '1d')
+            interval=interval,
+
+            # group by ticker (to access via data['SPY'])
+            # (optional, default is 'column')
+            group_by='column',
+
+            # adjust all OHLC automatically
+            # (optional, default is False)
+            auto_adjust=True,
+
+            # download pre/post regular market hours data
+            # (optional, default is False)
+            prepost=True,
+
+            # use threads for mass downloading? (True/False/Integer)
+            # we are already on a worker thread, a single ticker doesn't need more
+            threads=threads
+        )
+
+    async def get_history(self, symbol: str, period: str = "1d", interval: str = "1m"):
+        """Returns the price history of symbol as a DataFrame, including pre/post market."""
+        symbol = symbol.upper()
+        return await self.history_cache.get_or_fetch(
+            (symbol, period, interval),
+            lambda: self._run(self._download, symbol, period, interval),
+            ttl=self.history_ttl.get(interval)
+        )
+
+    def _download_batch(self, symbols: tuple, period, interval) -> dict:
+        """One download for all symbols, split into {symbol: DataFrame}. Unknown symbols get an empty frame."""
+        data = self._download(list(symbols), period, interval, threads=len(symbols) > 1)
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {symbols[0]: data}
+
+        # group_by='column': (field, ticker) columns, the rows are the union of every ticker's bars
+        tickers = set(data.columns.get_level_values(1))
+        # Flat single ticker columns for the missing ones too, like a download of just that symbol
+        missing = pd.DataFrame(columns=data.columns.get_level_values(0).unique(), index=data.index[:0], dtype=float)
+        return {
+            symbol: data.xs(symbol, axis=1, level=1).dropna(how='all') if symbol in tickers else missing
+            for symbol in symbols
+        }
+
+    async def get_histories(self, symbols, period: str = "1d", interval: str = "1m") -> dict:
+        """Returns {symbol: DataFrame} like get_history, the histories not cached yet come in a single request."""
+        symbols = tuple(dict.fromkeys(symbol.upper() for symbol in symbols))
+        ttl = self.history_ttl.get(interval)
+        histories = {symbol: self.history_cache.get((symbol, period, interval)) for symbol in symbols}
+
+        missing = tuple(symbol for symbol, data in histories.items() if data is MISSING)
+        if missing:
+            # Keyed by the whole batch so identical requests share the download, then cached per symbol
+            batch = await self.history_cache.get_or_fetch(
+                (missing, period, interval),
+                lambda: self._run(self._download_batch, missing, period, interval),
+                ttl=ttl
+            )
+            for symbol in missing:
+                self.history_cache.set((symbol, period, interval), batch[symbol], ttl)
+                histories[symbol] = batch[symbol]
+        return histories
+
+    async def get_bars(self, symbol: str, period: str = "1d", interval: str = "1m") -> Bars:
+        """Returns the bars of symbol for the period, out of the bar store where possible."""
+        symbol = symbol.upper()
+        session = trading_calendar.last_session(datetime.now(MARKET_TIMEZONE))
+        try:
+            # Counted from the last session that started, overnight "1d" still means the one that ended yesterday
+            start = period_start(period, session)
+        except (KeyError, ValueError):
+            start = False
+        if self.bar_store is None or start is False:
+            return Bars.from_frame(symbol, interval, await self.get_history(symbol, period, interval))
+
+        def fetch(start=None, period=None):
+            return self._download(symbol, period, interval, start=start)
+
+        await self.bar_refresh.get_or_fetch(
+            (symbol, interval, start),
+            lambda: self._run(self.bar_store.update, symbol, interval, fetch, start, period),
+            ttl=self.history_ttl.get(interval)
+        )
+        bars = self.bar_store.read(symbol, interval, start)
+        if bars.empty:
+            # Pre-market has no daily bar yet, yahoo would hand out the last session for a 1d period too
+            bars = self.bar_store.read_last_session(symbol, interval)
+
+        # Weekly and monthly bars are dated at their start, anything shorter has to reach into the last sessions.
+        # Older means yahoo failed to update them (quietly, it hands out empty frames), which isn't a price to show
+        if interval not in LONG_INTERVALS and not bars.empty:
+            last_day = bars.times[-1].astype('datetime64[D]').item()
+            if last_day < trading_calendar.previous_trading_day(session):
+                log.warning(f"Stored {symbol} {interval} bars end {last_day}, not serving them as current")
+                return Bars(symbol, interval, bars.records[:0])
+        return bars
+
+    async def get_quote(self, symbol: str):
+        """Returns a Quote for symbol, or None if yahoo has no data for it."""
+        bars = await self.get_bars(symbol, period='1d', interval='1d')
+        if bars.empty:
+            return None
+        return Quote(symbol, float(bars.open[-1]), float(bars.close[-1]))
+
+    async def get_close(self, symbol: str, day):
+        """Closing price of symbol on day (a trading day within the last month), None if yahoo has no bar for it."""
+        bars = await self.get_bars(symbol, period='1mo', interval='1d')
+        matches = np.flatnonzero(bars.times.astype('datetime64[D]') == np.datetime64(day, 'D'))
+        return float(bars.close[matches[-1]]) if len(matches) else None
+
+    async def get_quotes(self, symbols) -> dict:
+        """Returns {symbol: Quote} for all symbols with a single request, None for the ones yahoo has no data for."""
+        histories = await self.get_histories(symbols, period='1d', interval='1d')
+        return {
+            symbol: None if data.empty else Quote(symbol, float(data['Open'].iloc[-1]), float(data['Close'].iloc[-1]))
+            for symbol, data in histories.items()
+        }
+
+    async def _get_ticker(self, symbol: str):
+        """yf.Ticker with its expiries loaded. Shared, a new Ticker would download the expiries again for every chain."""
+        def load():
+            ticker = yf.Ticker(symbol)
+            ticker.options
+            return ticker
+
+        return await self.option_cache.get_or_fetch(("ticker", symbol), lambda: self._run(load), ttl=self.expiry_ttl)
+
+    async def get_option_expiries(self, symbol: str) -> tuple:
+        return (await self._get_ticker(symbol.upper())).options
+
+    async def get_option_chain(self, symbol: str, expiry: str) -> OptionChain:
+        """The chain of one expiry, reduced to arrays on the worker thread (yahoos' DataFrames never get cached)."""
+        symbol = symbol.upper()
+        ticker = await self._get_ticker(symbol)
+
+        async def fetch():
+            async with self._option_slots:
+                return await self._run(lambda: OptionChain.from_yfinance(expiry, ticker.option_chain(expiry)))
+
+        return await self.option_cache.get_or_fetch((symbol, expiry), fetch, ttl=self.option_ttl)
+
+    async def get_option_chains(self, symbol: str, expiries) -> list:
+        """The chains of all expiries side by side, in the order of expiries. Ones that failed are left out."""
+        chains = await asyncio.gather(*(self.get_option_chain(symbol, expiry) for expiry in expiries),
+                                      return_exceptions=True)
+        for expiry, chain in zip(expiries, chains):
+            if isinstance(chain, Exception):
+                log.error(f"option chain {symbol} {expiry}: {chain}")
+        return [chain for chain in chains if isinstance(chain, OptionChain)]
+
+    async def get_fundamentals(self, symbol: str):
+        """Fundamentals of symbol, None if yahoo doesn't know it. Projected on the worker thread, info is dropped."""
+        symbol = symbol.upper()
+        return await self.fundamentals_cache.get_or_fetch(
+            symbol,
+            lambda: self._run(lambda: Fundamentals.from_info(symbol, yf.Ticker(symbol).info))
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_market_data = None
+
+
+def get_market_data() -> MarketDataClient:
+    """Returns the market data client shared by all cogs."""
+    global _market_data
+    if _market_data is None:
+        _market_data = MarketDataClient(
+            max_workers=constants.MarketData.WORKERS,
+            timeout=constants.MarketData.TIMEOUT,
+            cache_size=constants.MarketData.CACHE_SIZE,
+            history_ttl=constants.MarketData.HISTORY_TTL,
+            bar_store=BarStore(f"{constants.FilePaths.STORAGE_PATH}{os.sep}bars", constants.MarketData.BAR_STORE_BYTES),
+            option_ttl=constants.Options.CHAIN_TTL,
+            expiry_ttl=constants.Options.EXPIRY_TTL,
+            option_concurrency=constants.Options.CONCURRENCY,
+            fundamentals_size=constants.MarketData.FUNDAMENTALS_SIZE,
+            fundamentals_ttl=constants.MarketData.FUNDAMENTALS_TTL
+        )
+    return _market_data
@@ -1,3 +1,5 @@
+import asyncio
+import logging as log
 from datetime import datetime
 import discord
 
@@ -34,4 +36,138 @@ class WarnMessage(Message):
 
     def new(self):
         return super().new()
-        
\ No newline at end of file
+        
+
+class Paginator():
+    """
+        Splits rows of text into embed pages. Rows are pulled from the iterator only when a page needs them, and
+        every page is built once, so paging through a long list costs one page of formatting per step.
+        A page holds at most rows_per_page rows and never goes past the 1024 characters of an embed field.
+
+        Examples:
+        rows = (f"{i + 1}: <@{user_id}> ${amount}" for i, (user_id, amount) in enumerate(balances))
+        await Paginator("Top balances", rows, header="*as of today*").send(self.bot, ctx, page=2)
+
+        Note:
+        send() returns right after the first page is up, the reaction navigation runs on its own task until
+        nobody touched the message for `timeout` seconds.
+    """
+
+    FIELD_LIMIT = 1024
+    PREVIOUS = "◀️"
+    NEXT = "▶️"
+
+    _END = object()
+
+    def __init__(self, title: str, rows, header: str = "", color: discord.Color = discord.Color(0xfa43ee),
+                 rows_per_page: int = 15):
+        self.title = title
+        self.header = header
+        self.color = color
+        self.rows_per_page = rows_per_page
+        self.pages = []
+        self._rows = iter(rows)
+        self._carry = self._END
+
+    @property
+    def exhausted(self) -> bool:
+        return self._carry is self._END and self._rows is None
+
+    @property
+    def page_count(self):
+        """Number of pages, None while the rows aren't all pulled yet."""
+        return len(self.pages) if self.exhausted else None
+
+    def _next_row(self):
+        if self._carry is not self._END:
+            row, self._carry = self._carry, self._END
+            return row
+        if self._rows is None:
+            return self._END
+
+        row = next(self._rows, self._END)
+        if row is self._END:
+            self._rows = None
+        elif len(row) > self.FIELD_LIMIT:
+            row = row[:self.FIELD_LIMIT - 1] + "…"
+        return row
+
+    def _build_page(self):
+        lines = []
+        size = 0
+        while len(lines) < self.rows_per_page:
+            row = self._next_row()
+            if row is self._END:
+                break
+            if lines and size + 1 + len(row) > self.FIELD_LIMIT:
+                self._carry = row
+                break
+            size += len(row) + (1 if lines else 0)
+            lines.append(row)
+
+        if lines:
+            self.pages.append("\n".join(lines))
+
+        # Look one row ahead, so we know whether there is another page
+        if self._carry is self._END:
+            self._carry = self._next_row()
+
+    def page(self, number: int) -> int:
+        """Builds the pages up to number, returns number clamped to the pages there are."""
+        while len(self.pages) < number and not self.exhausted:
+            self._build_page()
+        return min(max(1, number), max(1, len(self.pages)))
+
+    def has_next(self, number: int) -> bool:
+        return number < len(self.pages) or not self.exhausted
+
+    def embed(self, number: int) -> discord.Embed:
+        number = self.page(number)
+        em = discord.Embed(title=self.title, description=self.header or discord.Embed.Empty, color=self.color)
+        em.add_field(name="\u200b", value=self.pages[number - 1] if self.pages else "\u200b")
+
+        count = self.page_count
+        if count is None or count > 1:
+            em.set_footer(text=f"Page {number}/{'?' if count is None else count}")
+        return em
+
+    async def send(self, bot, destination, page: int = 1, timeout: float = 120.0) -> discord.Message:
+        """Sends the page to destination (a ctx or channel) and adds reaction navigation if there is more than it."""
+        page = self.page(page)
+        message = await destination.send(embed=self.embed(page))
+
+        if page > 1 or self.has_next(page):
+            asyncio.ensure_future(self._navigate(bot, message, page, timeout))
+        return message
+
+    async def _navigate(self, bot, message: discord.Message, page: int, timeout: float):
+        try:
+            await message.add_reaction(self.PREVIOUS)
+            await message.add_reaction(self.NEXT)
+
+            def check(reaction, user):
+                return reaction.message.id == message.id and not user.bot and \
+                    str(reaction.emoji) in (self.PREVIOUS, self.NEXT)
+
+            while True:
+                try:
+                    reaction, user = await bot.wait_for("reaction_add", check=check, timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+
+                if str(reaction.emoji) == self.NEXT and self.has_next(page):
+                    page = self.page(page + 1)
+                    await message.edit(embed=self.embed(page))
+                elif str(reaction.emoji) == self.PREVIOUS and page > 1:
+                    page -= 1
+                    await message.edit(embed=self.embed(page))
+
+                try:
+                    await message.remove_reaction(reaction.emoji, user)
+                except discord.HTTPException:
+                    # No manage messages permission, the user has to un-react themselves
+                    pass
+
+            await message.clear_reactions()
+        except discord.HTTPException as e:
+            log.warning(f"Paginator navigation stopped: {e}")
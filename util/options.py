@@ -0,0 +1,112 @@
+"""Option chains reduced to a few numpy arrays, and the summaries ticker-options shows of them."""
+import numpy as np
+
+CONTRACT_DTYPE = np.dtype([
+    ("strike", np.float64),
+    ("open_interest", np.float64),
+    ("volume", np.float64),
+    ("iv", np.float64),
+])
+
+# CONTRACT_DTYPE field -> yfinance column
+_COLUMNS = {
+    "strike": "strike",
+    "open_interest": "openInterest",
+    "volume": "volume",
+    "iv": "impliedVolatility",
+}
+
+
+def _contracts(frame):
+    """The columns we use out of a yfinance calls or puts DataFrame, missing values as 0."""
+    if frame is None:
+        return np.zeros(0, dtype=CONTRACT_DTYPE)
+
+    records = np.zeros(len(frame), dtype=CONTRACT_DTYPE)
+    for field, column in _COLUMNS.items():
+        if column in frame:
+            records[field] = frame[column].to_numpy(dtype=np.float64, na_value=0.0)
+    return records
+
+
+class OptionChain():
+    """
+        Calls and puts of one expiry as CONTRACT_DTYPE records, a few KB instead of yahoos' DataFrames.
+
+        Examples:
+        chain = OptionChain.from_yfinance("2021-06-18", yf.Ticker("gme").option_chain("2021-06-18"))
+        chain.calls["open_interest"].sum()
+    """
+    def __init__(self, expiry: str, calls, puts):
+        self.expiry = expiry
+        self.calls = calls
+        self.puts = puts
+
+    @classmethod
+    def from_yfinance(cls, expiry: str, chain):
+        return cls(expiry, _contracts(chain.calls), _contracts(chain.puts))
+
+    @property
+    def empty(self) -> bool:
+        return len(self.calls) == 0 and len(self.puts) == 0
+
+
+def max_pain(chain: OptionChain):
+    """Strike at which the open contracts of the chain are worth the least at expiry, None without any."""
+    strikes = np.union1d(chain.calls["strike"], chain.puts["strike"])
+    if len(strikes) == 0:
+        return None
+
+    # Value of every contract at every strike as the closing price, summed up per price
+    calls = np.clip(strikes[:, None] - chain.calls["strike"], 0, None) @ chain.calls["open_interest"]
+    puts = np.clip(chain.puts["strike"] - strikes[:, None], 0, None) @ chain.puts["open_interest"]
+    return float(strikes[np.argmin(calls + puts)])
+
+
+def put_call_ratio(chains, field: str = "open_interest"):
+    """Puts over calls summed over all chains, by "open_interest" or "volume". None without calls."""
+    calls = sum(chain.calls[field].sum() for chain in chains)
+    puts = sum(chain.puts[field].sum() for chain in chains)
+    return float(puts / calls) if calls else None
+
+
+def weighted_iv(contracts):
+    """Implied volatility averaged by open interest, None without open interest."""
+    open_interest = contracts["open_interest"].sum()
+    if not open_interest:
+        return None
+    return float((contracts["iv"] * contracts["open_interest"]).sum() / open_interest)
+
+
+def open_interest_by_strike(chains):
+    """Open interest summed over all chains per strike, as (strikes, call open interest, put open interest)."""
+    calls = np.concatenate([chain.calls for chain in chains]) if chains else np.zeros(0, dtype=CONTRACT_DTYPE)
+    puts = np.concatenate([chain.puts for chain in chains]) if chains else np.zeros(0, dtype=CONTRACT_DTYPE)
+
+    strikes, index = np.unique(np.concatenate((calls["strike"], puts["strike"])), return_inverse=True)
+    call_oi = np.bincount(index[:len(calls)], weights=calls["open_interest"], minlength=len(strikes))
+    put_oi = np.bincount(index[len(calls):], weights=puts["open_interest"], minlength=len(strikes))
+    return strikes, call_oi, put_oi
+
+
+def _short(number: float) -> str:
+    for limit, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "k")):
+        if number >= limit:
+            return f"{number / limit:.1f}{suffix}"
+    return f"{number:.0f}"
+
+
+def histogram_lines(strikes, call_oi, put_oi, rows: int = 12, width: int = 12) -> list:
+    """The rows strikes with the most open interest as text bars, in strike order."""
+    total = call_oi + put_oi
+    if len(total) == 0 or not total.max():
+        return []
+
+    top = np.argsort(total)[::-1][:rows]
+    top = np.sort(top[total[top] > 0])
+    longest = total[top].max()
+    lines = []
+    for i in top:
+        bar = "█" * max(1, round(width * total[i] / longest))
+        lines.append(f"{strikes[i]:>8.2f} {bar:<{width}} {_short(call_oi[i])}C {_short(put_oi[i])}P")
+    return lines
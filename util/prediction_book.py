@@ -0,0 +1,104 @@
+import bisect
+
+from util.scoring import PredictionSet
+from util.storage import Storage
+
+
+class PredictionBook():
+    """
+        Todays' predictions, kept in memory with an index of who submitted which methods.
+        Admission checks are dict/set lookups, every accepted prediction is appended to the storage.
+        The book is also kept sorted by predicted value, so the predictions nearest to a price are found with a
+        bisect and a walk outwards instead of sorting everything.
+
+        Examples:
+        book = PredictionBook(get_storage())
+        res = book.add(user.id, 69.69, "my smooth brain")  # [True] or [False, reason]
+        scores = book.prediction_set().score(close_price)
+    """
+
+    DUPLICATE_METHOD = 1
+    TOO_MANY = 2
+
+    def __init__(self, storage: Storage, max_per_user: int = 3):
+        self.storage = storage
+        self.max_per_user = max_per_user
+        self.entries = []
+        self.version = 0
+        self._methods_by_user = {}
+        self._sorted_values = []
+        self._sorted_entries = []
+        self._prediction_set = None
+
+        for item in storage.load_predictions():
+            self._index(item)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _index(self, item: dict):
+        self.entries.append(item)
+        self._methods_by_user.setdefault(item["user"], set()).add(item["method"])
+
+        # bisect_right, equal predictions stay in submission order
+        position = bisect.bisect_right(self._sorted_values, item["prediction"])
+        self._sorted_values.insert(position, item["prediction"])
+        self._sorted_entries.insert(position, item)
+
+        self.version += 1
+        self._prediction_set = None
+
+    def check(self, user_id, method: str):
+        """Returns None if the user may submit a prediction with this method, the reason why not otherwise."""
+        methods = self._methods_by_user.get(user_id, ())
+        if method in methods:
+            return self.DUPLICATE_METHOD
+        if len(methods) >= self.max_per_user:
+            return self.TOO_MANY
+        return None
+
+    def add(self, user_id, prediction: float, method: str) -> list:
+        reason = self.check(user_id, method)
+        if reason is not None:
+            return [False, reason]
+
+        item = {"user": user_id, "prediction": prediction, "method": method}
+        self.storage.add_prediction(user_id, prediction, method)
+        self._index(item)
+        return [True]
+
+    def prediction_set(self) -> PredictionSet:
+        """The predictions as numpy arrays, built once per change to the book."""
+        if self._prediction_set is None:
+            self._prediction_set = PredictionSet.from_records(self.entries)
+        return self._prediction_set
+
+    def nearest(self, price: float, n: int):
+        """Yields (item, distance, rank) for the n predictions closest to price, closest first. O(log n + N).
+        Rank is dense like in the scoring: equal predictions share it. On equal distance the lower prediction wins."""
+        values = self._sorted_values
+        right = bisect.bisect_left(values, price)
+        left = right - 1
+
+        rank = 0
+        prev = None
+        for _ in range(min(n, len(values))):
+            if right >= len(values) or (left >= 0 and price - values[left] <= values[right] - price):
+                position, left = left, left - 1
+            else:
+                position, right = right, right + 1
+
+            value = values[position]
+            if value != prev:
+                rank += 1
+                prev = value
+            yield self._sorted_entries[position], abs(value - price), rank
+
+    def clear(self):
+        self.storage.clear_predictions()
+        self.entries = []
+        self.version += 1
+        self._methods_by_user = {}
+        self._sorted_values = []
+        self._sorted_entries = []
+        self._prediction_set = None
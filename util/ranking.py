@@ -0,0 +1,47 @@
+import bisect
+
+
+class Ranking():
+    """
+        Keys ordered by a score, highest first, kept sorted as the scores change. An update is a bisect plus a list
+        insert/delete (a memmove), reading the top k is O(k) with no sorting.
+
+        Ties are ordered by key, so the order is stable between calls, and share a rank like in sports:
+        100, 50, 50, 10 are ranked 1, 2, 2, 4.
+
+        Examples:
+        ranking = Ranking({user_id: account["wallet"] for user_id, account in accounts.items()})
+        ranking.update(user_id, new_balance)
+        for rank, user_id, balance in ranking.top(10):
+            ...
+    """
+    def __init__(self, scores: dict = None):
+        self.scores = dict(scores or {})
+        # (-score, key), ascending, so the highest score comes first
+        self._order = sorted((-score, key) for key, score in self.scores.items())
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, key):
+        return key in self.scores
+
+    def update(self, key, score):
+        if key in self.scores:
+            old = self.scores[key]
+            if old == score:
+                return
+            del self._order[bisect.bisect_left(self._order, (-old, key))]
+
+        self.scores[key] = score
+        bisect.insort(self._order, (-score, key))
+
+    def top(self, k: int):
+        """Yields (rank, key, score) for the first k keys. A tie across position k is cut off like any other row."""
+        rank = 0
+        prev = None
+        for position, (negative, key) in enumerate(self._order[:max(k, 0)]):
+            if negative != prev:
+                rank = position + 1
+                prev = negative
+            yield rank, key, -negative
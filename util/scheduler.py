@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging as log
+import os
+from datetime import date, datetime, timedelta
+
+import pytz
+
+MARKET_TIMEZONE = pytz.timezone("America/New_York")
+
+
+class DailyJob():
+    """
+        A coroutine to run once on every day `at` returns a time for.
+
+        Args:
+            name: unique name, the last run is persisted under it
+            callback: coroutine function taking the datetime of the occurrence it runs for. That's in the past when
+                a missed occurrence is caught up on, e.g. results for Friday running on Monday
+            at: callable taking a date and returning the wall clock time to run on it, or None to skip that day
+            catch_up: run the last missed occurrence once when the scheduler starts
+    """
+    def __init__(self, name: str, callback, at, catch_up: bool = True):
+        self.name = name
+        self.callback = callback
+        self.at = at
+        self.catch_up = catch_up
+
+
+class MarketScheduler():
+    """
+        Sleeps until the next job is due instead of polling the clock. Times are wall clock times in the market
+        timezone (America/New_York), so DST is handled by the timezone and not by the jobs.
+
+        Examples:
+        scheduler = MarketScheduler(f"{constants.FilePaths.STORAGE_PATH}{os.sep}scheduler_state.json")
+        scheduler.add_job(DailyJob("market_open", self.close_submissions, trading_calendar.market_open))
+        scheduler.start()
+
+        Note:
+        The day of a run is saved before its callback is awaited, a job runs at most once per day even when the
+        bot crashes halfway through it. On start, a job whose last occurrence was missed (bot offline) runs once,
+        unless the job has no saved run at all (first start).
+    """
+
+    LOOKAHEAD_DAYS = 14
+
+    def __init__(self, state_path: str, timezone=MARKET_TIMEZONE):
+        self.state_path = state_path
+        self.timezone = timezone
+        self.jobs = {}
+        self._last_runs = self._load_state()
+        self._task = None
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._last_runs, f, indent=4)
+        os.replace(tmp_path, self.state_path)
+
+    def now(self) -> datetime:
+        return datetime.now(self.timezone)
+
+    def add_job(self, job: DailyJob):
+        self.jobs[job.name] = job
+
+    def _occurrence(self, job: DailyJob, day: date):
+        at = job.at(day)
+        if at is None:
+            return None
+        return self.timezone.localize(datetime.combine(day, at))
+
+    def next_run(self, job: DailyJob, after: datetime):
+        """First occurrence of job strictly after `after`."""
+        for offset in range(self.LOOKAHEAD_DAYS + 1):
+            when = self._occurrence(job, after.date() + timedelta(days=offset))
+            if when is not None and when > after:
+                return when
+        return None
+
+    def last_due(self, job: DailyJob, now: datetime):
+        """Latest occurrence of job at or before now."""
+        for offset in range(self.LOOKAHEAD_DAYS + 1):
+            when = self._occurrence(job, now.date() - timedelta(days=offset))
+            if when is not None and when <= now:
+                return when
+        return None
+
+    def has_run(self, job: DailyJob, when: datetime) -> bool:
+        last_run = self._last_runs.get(job.name)
+        return last_run is not None and last_run >= when.date().isoformat()
+
+    async def _fire(self, job: DailyJob, when: datetime):
+        self._last_runs[job.name] = when.date().isoformat()
+        self._save_state()
+
+        log.info(f"Running scheduled job {job.name} for {when.isoformat()}")
+        try:
+            await job.callback(when)
+        except Exception as e:
+            log.error(f"Scheduled job {job.name} failed: {e}")
+
+    async def _fire_due(self, since: datetime = None):
+        """Runs every job that came due after `since` and didn't run yet, oldest first.
+        Without `since` this is the startup catch up, which only covers jobs with catch_up set."""
+        now = self.now()
+        due = []
+        for job in self.jobs.values():
+            when = self.last_due(job, now)
+            if when is None or self.has_run(job, when):
+                continue
+            if since is None and job.name not in self._last_runs:
+                # Never ran here before, nothing was missed. Start counting from now on
+                self._last_runs[job.name] = when.date().isoformat()
+                self._save_state()
+                continue
+            if since is None and not job.catch_up:
+                continue
+            if since is not None and when <= since:
+                continue
+            due.append((when, job))
+
+        # e.g. a missed open still runs before a missed results
+        for when, job in sorted(due, key=lambda item: item[0]):
+            await self._fire(job, when)
+
+    async def _run(self):
+        await self._fire_due()
+        checked = self.now()
+
+        while True:
+            upcoming = [self.next_run(job, checked) for job in self.jobs.values()]
+            upcoming = [when for when in upcoming if when is not None]
+            if not upcoming:
+                log.warning("MarketScheduler has nothing to run, stopping")
+                return
+
+            await asyncio.sleep(max(0.0, (min(upcoming) - self.now()).total_seconds()))
+
+            # Everything that came due while sleeping (or while the previous jobs ran)
+            now = self.now()
+            await self._fire_due(since=checked)
+            checked = now
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
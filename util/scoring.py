@@ -0,0 +1,109 @@
+import numpy as np
+
+PLACES = ("first", "second", "third")
+
+
+class PredictionSet():
+    """
+        The days' predictions as parallel numpy arrays. Methods are stored once in `methods`,
+        the arrays only keep an index into it.
+
+        Examples:
+        predictions = PredictionSet.from_records(storage.load_predictions())
+        scores = predictions.score(close_price)
+    """
+    def __init__(self, user_ids, values, method_ids, methods: list):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.method_ids = np.asarray(method_ids, dtype=np.int32)
+        self.methods = methods
+
+    @classmethod
+    def from_records(cls, records: list):
+        """Builds the arrays from {"user", "prediction", "method"} dicts, the way the storage hands them out."""
+        methods = []
+        method_index = {}
+        method_ids = []
+        for item in records:
+            index = method_index.get(item["method"])
+            if index is None:
+                index = method_index[item["method"]] = len(methods)
+                methods.append(item["method"])
+            method_ids.append(index)
+
+        return cls(
+            [item["user"] for item in records],
+            [item["prediction"] for item in records],
+            method_ids,
+            methods
+        )
+
+    def __len__(self):
+        return len(self.values)
+
+    def score(self, price: float, mayo_band: float = 0.01):
+        return score_predictions(self, price, mayo_band)
+
+
+class PredictionScores():
+    """
+        Predictions ranked against a price. Everything is in rank order (closest first).
+
+        Attributes:
+            order: indexes into the PredictionSet, closest prediction first
+            distances: abs(prediction - price)
+            ranks: dense rank, 1 based. Equal predictions share a rank, the next one is rank + 1
+            mayo: predictions outside the top 3 ranks, but within mayo_band of the price
+    """
+    def __init__(self, predictions: PredictionSet, price: float, order, distances, ranks, mayo):
+        self.predictions = predictions
+        self.price = price
+        self.order = order
+        self.distances = distances
+        self.ranks = ranks
+        self.mayo = mayo
+
+    def __len__(self):
+        return len(self.order)
+
+    def row(self, position: int):
+        """(user_id, prediction, method, distance, rank) of the prediction at position in the ranking."""
+        index = self.order[position]
+        return (
+            int(self.predictions.user_ids[index]),
+            float(self.predictions.values[index]),
+            self.predictions.methods[self.predictions.method_ids[index]],
+            float(self.distances[position]),
+            int(self.ranks[position])
+        )
+
+    def rows(self, start: int = 0, stop: int = None):
+        for position in range(start, len(self) if stop is None else min(stop, len(self))):
+            yield self.row(position)
+
+    def payouts(self):
+        """(user_id, prediction, method, award) of every winner, best first."""
+        winners = np.flatnonzero((self.ranks <= len(PLACES)) | self.mayo)
+        for position in winners:
+            user_id, value, method, _, rank = self.row(position)
+            yield user_id, value, method, PLACES[rank - 1] if rank <= len(PLACES) else "mayo"
+
+
+def score_predictions(predictions: PredictionSet, price: float, mayo_band: float = 0.01) -> PredictionScores:
+    """Ranks every prediction against price in one vectorized pass."""
+    distances = np.abs(predictions.values - price)
+
+    # By distance, then the lower prediction first (like PredictionBook.nearest), then submission order.
+    # 99 and 101 are as close to 100, sorting by distance alone could put a 101 between two 99s
+    order = np.lexsort((predictions.values, distances))
+    sorted_values = predictions.values[order]
+    sorted_distances = distances[order]
+
+    # Equal predictions sit next to each other after sorting, a new rank starts wherever the value changes
+    new_rank = np.ones(len(order), dtype=bool)
+    new_rank[1:] = sorted_values[1:] != sorted_values[:-1]
+    ranks = np.cumsum(new_rank)
+
+    mayo = (ranks > len(PLACES)) & (sorted_distances <= price * mayo_band)
+
+    return PredictionScores(predictions, price, order, sorted_distances, ranks, mayo)
@@ -0,0 +1,98 @@
+import json
+import logging as log
+import re
+
+_NOT_WORDS = re.compile(r"[^\w]+")
+
+
+def normalize(name: str) -> str:
+    """Case folded with spaces and punctuation dropped, "Jar-of  MAYO" and "jarofmayo" are the same name."""
+    return _NOT_WORDS.sub("", name.casefold())
+
+
+def _deletions(key: str):
+    """key with one character left out, at every position."""
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+class ShopItem():
+    def __init__(self, name: str, price: int, description: str = "", aliases=()):
+        self.name = name
+        self.key = name.casefold()
+        self.price = price
+        self.description = description
+        self.aliases = tuple(aliases)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["name"], data["price"], data.get("description", ""), data.get("aliases", ()))
+
+
+class ShopCatalog():
+    """
+        The shop, keyed by case folded item name. Every lookup is a few dict hits, whatever the size of the catalog.
+
+        Names and aliases are indexed normalized (see normalize), and for typos together with every one character
+        deletion of them (a symmetric delete index). "lamob" and "lambo" share the deletion "lamb", so a name one
+        edit away is found by looking up the deletions of the query instead of comparing it to every item.
+
+        Examples:
+        catalog = ShopCatalog.load(f"{constants.FilePaths.CONFIG_PATH}{os.sep}shop.json")
+        item = catalog.find("lamborghini")  # ShopItem("Lambo", ...)
+    """
+    def __init__(self, items):
+        self.items = {}
+        self._exact = {}
+        self._fuzzy = {}
+
+        for item in items:
+            if item.key in self.items:
+                log.warning(f"Duplicate shop item {item.name}, keeping the first one")
+                continue
+            self.items[item.key] = item
+
+        # Names win over aliases, aliases over typos
+        for item in self.items.values():
+            self._exact.setdefault(normalize(item.name), item.key)
+        for item in self.items.values():
+            for alias in item.aliases:
+                self._exact.setdefault(normalize(alias), item.key)
+
+        for name, key in self._exact.items():
+            for variant in (name, *_deletions(name)):
+                self._fuzzy.setdefault(variant, set()).add(key)
+
+    @classmethod
+    def load(cls, path: str):
+        """Reads a json list of {"name", "price", "description", "aliases"} objects."""
+        with open(path, 'r') as f:
+            return cls(ShopItem.from_dict(data) for data in json.load(f))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items.values())
+
+    def get(self, key: str):
+        """Item by its key (the case folded name, as used in the inventories), None if there is no such item."""
+        return self.items.get(key.casefold())
+
+    def find(self, name: str):
+        """Item the user most likely meant with name, None if nothing or more than one item is a close match."""
+        item = self.items.get(name.casefold())
+        if item is not None:
+            return item
+
+        query = normalize(name)
+        key = self._exact.get(query)
+        if key is not None:
+            return self.items[key]
+
+        # One edit away: the query itself or one of its deletions matches a name, or a deletion of a name
+        candidates = set()
+        for variant in (query, *_deletions(query)):
+            candidates.update(self._fuzzy.get(variant, ()))
+        if len(candidates) == 1:
+            return self.items[candidates.pop()]
+        return None
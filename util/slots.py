@@ -0,0 +1,114 @@
+"""Slot machine odds and outcomes, without anything discord in it.
+
+Play it with SlotMachine.spin(), check the odds before changing them with simulate():
+    python -m util.slots --spins 10000000
+"""
+import argparse
+import random
+
+import numpy as np
+
+SYMBOLS = ('bus', 'train', 'horse', 'tiger', 'monkey', 'cow')
+
+# Net wallet change per unit bet, by the number of matching reels
+PAYOUTS = {
+    3: 4,
+    2: 2,
+    1: -1,
+}
+
+
+class Spin():
+    def __init__(self, reels: tuple, matches: int, change: int):
+        self.reels = reels
+        self.matches = matches
+        self.change = change
+
+    @property
+    def won(self) -> bool:
+        return self.change > 0
+
+
+class SlotMachine():
+    """
+        Three reels over the same symbols, paid by how many reels match.
+
+        Examples:
+        machine = SlotMachine(seed=420)
+        spin = machine.spin(69)  # spin.reels, spin.change
+    """
+    def __init__(self, symbols=SYMBOLS, payouts: dict = None, seed=None):
+        self.symbols = symbols
+        self.payouts = PAYOUTS if payouts is None else payouts
+        self.rng = random.Random(seed)
+
+    def spin(self, amount: int) -> Spin:
+        reels = tuple(self.rng.choice(self.symbols) for _ in range(3))
+        # 3 different symbols: 1 (no match), 2 different: 2 matching reels, 1: all 3
+        matches = 4 - len(set(reels))
+        return Spin(reels, matches, self.payouts[matches] * amount)
+
+    def expected_value(self) -> float:
+        """Exact mean wallet change per unit bet."""
+        n = len(self.symbols)
+        odds = {
+            3: n / n ** 3,
+            2: 3 * n * (n - 1) / n ** 3,
+            1: n * (n - 1) * (n - 2) / n ** 3,
+        }
+        return sum(odds[matches] * payout for matches, payout in self.payouts.items())
+
+
+def simulate(machine: SlotMachine, spins: int, seed=None, chunk: int = 1_000_000) -> dict:
+    """Plays spins unit bets with numpy, chunk spins at a time to keep the memory flat.
+
+    Returns the mean change per unit bet (the players' expected value, the house edge is minus that),
+    its standard error and how often each number of matching reels came up.
+    """
+    rng = np.random.default_rng(seed)
+    payout_of = np.zeros(4)
+    for matches, payout in machine.payouts.items():
+        payout_of[matches] = payout
+
+    total = 0.0
+    total_sq = 0.0
+    counts = np.zeros(4, dtype=np.int64)
+    for start in range(0, spins, chunk):
+        n = min(chunk, spins - start)
+        reels = rng.integers(0, len(machine.symbols), size=(n, 3))
+
+        a, b, c = reels[:, 0], reels[:, 1], reels[:, 2]
+        pairs = (a == b).astype(np.int8) + (a == c) + (b == c)
+        # 0 equal pairs: no match, 1 pair: two reels match, 3 pairs: all three
+        matches = np.where(pairs == 3, 3, np.where(pairs == 1, 2, 1))
+
+        changes = payout_of[matches]
+        total += changes.sum()
+        total_sq += np.square(changes).sum()
+        counts += np.bincount(matches, minlength=4)
+
+    mean = total / spins
+    variance = total_sq / spins - mean ** 2
+    return {
+        "spins": spins,
+        "expected_value": mean,
+        "house_edge": -mean,
+        "std_error": float(np.sqrt(variance / spins)),
+        "frequency": {int(matches): counts[matches] / spins for matches in machine.payouts},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate the slot machine odds")
+    parser.add_argument("--spins", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    machine = SlotMachine()
+    result = simulate(machine, args.spins, args.seed)
+    print(f"spins:          {result['spins']}")
+    print(f"expected value: {result['expected_value']:+.5f} per $1 bet (+/- {result['std_error']:.5f}), "
+          f"exact {machine.expected_value():+.5f}")
+    print(f"house edge:     {result['house_edge'] * 100:+.3f}%")
+    for matches, frequency in sorted(result["frequency"].items(), reverse=True):
+        print(f"{matches} matching:     {frequency * 100:.3f}%")
@@ -0,0 +1,428 @@
+import abc
+import json
+import logging as log
+import os
+import sqlite3
+import threading
+
+import constants
+
+AWARD_KEYS = ("first", "second", "third", "mayo")
+
+
+class Storage(abc.ABC):
+    """
+        Persistence for the bank, the prediction leaderboard and todays' predictions.
+        Keeps the cogs independent of where the data actually lives, pick a backend with constants.Storage.BACKEND
+
+        Examples:
+        storage = get_storage()
+        storage.add_prediction(user.id, 69.69, "my smooth brain")
+
+        Note:
+        Account ids are stored as strings in the dicts handed out, the same way bank.json always had them.
+    """
+
+    # Bank accounts
+
+    @abc.abstractmethod
+    def load_accounts(self) -> dict:
+        ...
+
+    @abc.abstractmethod
+    def commit_accounts(self, created: list, wallet_deltas: dict, inventories: dict, mutations: list = ()):
+        """Persists a batch of ledger changes.
+
+        Args:
+            created: ids of accounts opened since the last commit
+            wallet_deltas: id -> amount to add to the wallet
+            inventories: id -> the complete new inventory of that account
+            mutations: what the batch was made of, {"user", "reason", "wallet"} or {"user", "reason", "item", "amount"}
+        """
+
+    # Prediction leaderboard
+
+    @abc.abstractmethod
+    def load_leaderboard(self) -> dict:
+        ...
+
+    @abc.abstractmethod
+    def add_leaderboard_awards(self, awards: list, participants=()):
+        """Adds (user_id, prize, award) tuples to the leaderboard in one write.
+        Missing users are created, so are the participants that didn't win anything."""
+
+    # Todays' predictions
+
+    @abc.abstractmethod
+    def load_predictions(self) -> list:
+        ...
+
+    @abc.abstractmethod
+    def add_prediction(self, user_id, prediction, method):
+        ...
+
+    @abc.abstractmethod
+    def clear_predictions(self):
+        ...
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """
+        The original storage, one json file per store. Files are replaced atomically (temp file + rename),
+        a crash mid write leaves the previous version in place.
+
+        The bank isn't rewritten per change: every committed batch is appended to bank_journal.jsonl with one fsync,
+        and bank.json is only rewritten as a snapshot once the journal grows past compact_bytes (and on close).
+        Predictions are appended to a json lines journal next to predictions_today.json the same way.
+
+        Note:
+        A journal record holds the complete accounts it touched, not the deltas. Replaying it is idempotent,
+        so a crash between writing the snapshot and truncating the journal can't apply a change twice.
+    """
+
+    def __init__(self, storage_path: str, compact_bytes: int = constants.Storage.JOURNAL_COMPACT_BYTES):
+        self.bank_path = f"{storage_path}{os.sep}bank.json"
+        self.bank_journal_path = f"{storage_path}{os.sep}bank_journal.jsonl"
+        self.leaderboard_path = f"{storage_path}{os.sep}prediction_leaderboards.json"
+        self.predictions_path = f"{storage_path}{os.sep}predictions_today.json"
+        self.predictions_journal_path = f"{storage_path}{os.sep}predictions_today.jsonl"
+        self.compact_bytes = compact_bytes
+        self._accounts = None
+        self._journal = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read(path, default):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f) or default
+        except FileNotFoundError:
+            return default
+
+    @staticmethod
+    def _write(path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_journal(path):
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # A line torn by a crash mid append, it was never confirmed
+                        log.warning(f"Skipping broken line in {path}")
+        except FileNotFoundError:
+            return
+
+    @staticmethod
+    def _trim_torn_tail(path):
+        """Cuts a journal back to its last complete line, so the next append doesn't land on a torn one."""
+        try:
+            with open(path, 'rb+') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size == 0:
+                    return
+                f.seek(size - 1)
+                if f.read(1) == b"\n":
+                    return
+                f.seek(0)
+                data = f.read()
+                f.truncate(data.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            return
+
+    def _load_bank(self):
+        self._trim_torn_tail(self.bank_journal_path)
+        accounts = self._read(self.bank_path, {})
+        for record in self._read_journal(self.bank_journal_path):
+            accounts.update(record["accounts"])
+        return accounts
+
+    def load_accounts(self) -> dict:
+        # Keep our own copy, the ledger mutates the dict it gets handed
+        with self._lock:
+            self._accounts = self._load_bank()
+            return json.loads(json.dumps(self._accounts))
+
+    def commit_accounts(self, created: list, wallet_deltas: dict, inventories: dict, mutations: list = ()):
+        with self._lock:
+            if self._accounts is None:
+                self._accounts = self._load_bank()
+
+            # The batch is applied to copies, self._accounts only takes them once the record is on disk.
+            # A failed commit is retried by the ledger with the same deltas, they must not count twice
+            touched = {}
+            for user_id in (*created, *wallet_deltas, *inventories):
+                key = str(user_id)
+                touched[key] = dict(self._accounts.get(key, {"wallet": 0}))
+            for user_id, change in wallet_deltas.items():
+                touched[str(user_id)]["wallet"] += change
+            for user_id, inventory in inventories.items():
+                touched[str(user_id)]["inventory"] = inventory
+
+            record = {"accounts": touched, "mutations": list(mutations)}
+            if self._journal is None:
+                self._journal = open(self.bank_journal_path, 'a')
+            position = self._journal.tell()
+            try:
+                self._journal.write(f"{json.dumps(record)}\n")
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            except Exception:
+                self._discard_journal_tail(position)
+                raise
+            self._accounts.update(touched)
+
+            if self._journal.tell() >= self.compact_bytes:
+                self._compact()
+
+    def _discard_journal_tail(self, position: int):
+        """Drops the handle and whatever a failed append left after position. Call with the lock held."""
+        try:
+            self._journal.close()
+        except OSError:
+            pass
+        self._journal = None
+        try:
+            os.truncate(self.bank_journal_path, position)
+        except OSError as e:
+            # The torn line is skipped and trimmed on the next load
+            log.error(f"Couldn't cut the failed append off {self.bank_journal_path}: {e}")
+
+    def _compact(self):
+        """Writes the accounts as the new bank.json snapshot and empties the journal. Call with the lock held."""
+        self._write(self.bank_path, self._accounts)
+        if self._journal is None:
+            self._journal = open(self.bank_journal_path, 'a')
+        self._journal.seek(0)
+        self._journal.truncate()
+        os.fsync(self._journal.fileno())
+
+    def load_leaderboard(self) -> dict:
+        return self._read(self.leaderboard_path, {})
+
+    def add_leaderboard_awards(self, awards: list, participants=()):
+        users = self.load_leaderboard()
+        for user_id in participants:
+            users.setdefault(str(user_id), {"prize_total": 0, "awards": {key: 0 for key in AWARD_KEYS}})
+        for user_id, prize, award in awards:
+            user = users.setdefault(str(user_id), {"prize_total": 0, "awards": {key: 0 for key in AWARD_KEYS}})
+            user["prize_total"] += prize
+            user["awards"][award] += 1
+
+        self._write(self.leaderboard_path, users)
+
+    def load_predictions(self) -> list:
+        self._trim_torn_tail(self.predictions_journal_path)
+        predictions = self._read(self.predictions_path, {}).get("predictions", [])
+        predictions.extend(self._read_journal(self.predictions_journal_path))
+        return predictions
+
+    def add_prediction(self, user_id, prediction, method):
+        line = json.dumps({"user": user_id, "prediction": prediction, "method": method})
+        with open(self.predictions_journal_path, 'a') as f:
+            f.write(f"{line}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear_predictions(self):
+        self._write(self.predictions_path, {})
+        open(self.predictions_journal_path, 'w').close()
+
+    def close(self):
+        with self._lock:
+            if self._journal is None:
+                return
+            if self._journal.tell() and self._accounts is not None:
+                self._compact()
+            self._journal.close()
+            self._journal = None
+
+
+class SqliteStorage(Storage):
+    """
+        SQLite in WAL mode. Every store is a table with one indexed row per user,
+        so a balance change is a single row UPDATE instead of rewriting every account.
+
+        Note:
+        The statements are constant strings with ? parameters, sqlite3 keeps them prepared in its statement cache.
+        The connection is shared with the executor threads the ledger flushes from, hence the lock.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS accounts (
+            user_id INTEGER PRIMARY KEY,
+            wallet INTEGER NOT NULL DEFAULT 0,
+            inventory TEXT NOT NULL DEFAULT '[]'
+        );
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            user_id INTEGER PRIMARY KEY,
+            prize_total INTEGER NOT NULL DEFAULT 0,
+            first INTEGER NOT NULL DEFAULT 0,
+            second INTEGER NOT NULL DEFAULT 0,
+            third INTEGER NOT NULL DEFAULT 0,
+            mayo INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS predictions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            prediction REAL NOT NULL,
+            method TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS predictions_user_id ON predictions (user_id);
+    """
+
+    CREATE_ACCOUNT = "INSERT OR IGNORE INTO accounts (user_id) VALUES (?)"
+    ADD_TO_WALLET = "UPDATE accounts SET wallet = wallet + ? WHERE user_id = ?"
+    SET_INVENTORY = "UPDATE accounts SET inventory = ? WHERE user_id = ?"
+    CREATE_LEADERBOARD_USER = "INSERT OR IGNORE INTO leaderboard (user_id) VALUES (?)"
+    ADD_AWARD = {
+        award: f"UPDATE leaderboard SET prize_total = prize_total + ?, {award} = {award} + 1 WHERE user_id = ?"
+        for award in AWARD_KEYS
+    }
+    INSERT_PREDICTION = "INSERT INTO predictions (user_id, prediction, method) VALUES (?, ?, ?)"
+
+    def __init__(self, path: str, storage_path: str = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+        if storage_path is not None:
+            self.migrate_from_json(storage_path)
+
+    def _transaction(self, statements):
+        """Runs (sql, params) pairs in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def migrate_from_json(self, storage_path: str) -> bool:
+        """One-shot import of the json stores. Does nothing once it ran successfully."""
+        if self._query("SELECT value FROM meta WHERE key = 'json_migrated'"):
+            return False
+
+        source = JsonStorage(storage_path)
+        statements = []
+
+        for user_id, account in source.load_accounts().items():
+            statements.append((
+                "INSERT OR REPLACE INTO accounts (user_id, wallet, inventory) VALUES (?, ?, ?)",
+                (int(user_id), account.get("wallet", 0), json.dumps(account.get("inventory", [])))
+            ))
+
+        for user_id, user in source.load_leaderboard().items():
+            awards = user.get("awards", {})
+            statements.append((
+                "INSERT OR REPLACE INTO leaderboard (user_id, prize_total, first, second, third, mayo) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (int(user_id), user.get("prize_total", 0), *(awards.get(key, 0) for key in AWARD_KEYS))
+            ))
+
+        for item in source.load_predictions():
+            statements.append((self.INSERT_PREDICTION, (item["user"], item["prediction"], item["method"])))
+
+        statements.append(("INSERT INTO meta (key, value) VALUES ('json_migrated', '1')", ()))
+        self._transaction(statements)
+
+        log.info(f"Migrated {len(statements) - 1} rows from json storage into {self.path}")
+        return True
+
+    def load_accounts(self) -> dict:
+        rows = self._query("SELECT user_id, wallet, inventory FROM accounts")
+        accounts = {}
+        for user_id, wallet, inventory in rows:
+            accounts[str(user_id)] = {"wallet": wallet}
+            inventory = json.loads(inventory)
+            if inventory:
+                accounts[str(user_id)]["inventory"] = inventory
+        return accounts
+
+    def commit_accounts(self, created: list, wallet_deltas: dict, inventories: dict, mutations: list = ()):
+        # The database is its own journal, the mutations aren't kept here
+        statements = [(self.CREATE_ACCOUNT, (int(user_id),)) for user_id in {*created, *wallet_deltas, *inventories}]
+        statements += [(self.ADD_TO_WALLET, (change, int(user_id))) for user_id, change in wallet_deltas.items()]
+        statements += [
+            (self.SET_INVENTORY, (json.dumps(inventory), int(user_id))) for user_id, inventory in inventories.items()
+        ]
+        self._transaction(statements)
+
+    def load_leaderboard(self) -> dict:
+        rows = self._query("SELECT user_id, prize_total, first, second, third, mayo FROM leaderboard")
+        return {
+            str(user_id): {"prize_total": prize_total, "awards": dict(zip(AWARD_KEYS, awards))}
+            for user_id, prize_total, *awards in rows
+        }
+
+    def add_leaderboard_awards(self, awards: list, participants=()):
+        statements = [(self.CREATE_LEADERBOARD_USER, (int(user_id),)) for user_id in participants]
+        for user_id, prize, award in awards:
+            statements.append((self.CREATE_LEADERBOARD_USER, (int(user_id),)))
+            statements.append((self.ADD_AWARD[award], (prize, int(user_id))))
+        self._transaction(statements)
+
+    def load_predictions(self) -> list:
+        rows = self._query("SELECT user_id, prediction, method FROM predictions ORDER BY id")
+        return [{"user": user_id, "prediction": prediction, "method": method} for user_id, prediction, method in rows]
+
+    def add_prediction(self, user_id, prediction, method):
+        self._transaction([(self.INSERT_PREDICTION, (int(user_id), prediction, method))])
+
+    def clear_predictions(self):
+        self._transaction([("DELETE FROM predictions", ())])
+
+    def close(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.close()
+
+
+_storage = None
+
+
+def get_storage() -> Storage:
+    """Returns the storage shared by all cogs, opening the backend from constants.Storage on first use."""
+    global _storage
+    if _storage is None:
+        if constants.Storage.BACKEND == "sqlite":
+            _storage = SqliteStorage(
+                f"{constants.FilePaths.STORAGE_PATH}{os.sep}{constants.Storage.DATABASE}",
+                constants.FilePaths.STORAGE_PATH
+            )
+        else:
+            _storage = JsonStorage(constants.FilePaths.STORAGE_PATH)
+    return _storage
+
+
+def close_storage():
+    """Closes the shared storage. Only on shutdown, after every cog using it is unloaded (the ledger flushes then)."""
+    global _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
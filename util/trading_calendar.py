@@ -0,0 +1,157 @@
+"""NYSE trading calendar, generated from the exchange holiday rules at import time.
+
+Every lookup is a dict/set hit on precomputed dates, no network access needed.
+
+Examples:
+    trading_calendar.is_trading_day(date(2024, 11, 28))  -> False (Thanksgiving Day)
+    trading_calendar.market_close(date(2024, 11, 29))    -> 13:00, day after Thanksgiving
+"""
+from datetime import date, datetime, time, timedelta
+
+PREMARKET_OPEN = time(4, 0)
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+FIRST_YEAR = 2000
+LAST_YEAR = 2050
+
+# Closures that don't follow a rule (national days of mourning, weather, ...)
+SPECIAL_CLOSURES = {
+    date(2001, 9, 11): "September 11",
+    date(2001, 9, 12): "September 11",
+    date(2001, 9, 13): "September 11",
+    date(2001, 9, 14): "September 11",
+    date(2004, 6, 11): "Day of Mourning for Ronald Reagan",
+    date(2007, 1, 2): "Day of Mourning for Gerald Ford",
+    date(2012, 10, 29): "Hurricane Sandy",
+    date(2012, 10, 30): "Hurricane Sandy",
+    date(2018, 12, 5): "Day of Mourning for George H.W. Bush",
+    date(2025, 1, 9): "Day of Mourning for Jimmy Carter",
+}
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th (1 based) weekday (0=monday) of the month, n=-1 for the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Gregorian easter sunday (anonymous gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on friday, sunday holidays on monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _holidays(year: int) -> dict:
+    holidays = {}
+
+    # New Years' Day is not moved back to friday when it falls on a saturday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = "New Year's Day"
+
+    holidays[_nth_weekday(year, 1, 0, 3)] = "Martin Luther King, Jr. Day"
+    holidays[_nth_weekday(year, 2, 0, 3)] = "Washington's Birthday"
+    holidays[_easter(year) - timedelta(days=2)] = "Good Friday"
+    holidays[_nth_weekday(year, 5, 0, -1)] = "Memorial Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = "Juneteenth National Independence Day"
+    holidays[_observed(date(year, 7, 4))] = "Independence Day"
+    holidays[_nth_weekday(year, 9, 0, 1)] = "Labor Day"
+    holidays[_nth_weekday(year, 11, 3, 4)] = "Thanksgiving Day"
+    holidays[_observed(date(year, 12, 25))] = "Christmas Day"
+
+    return holidays
+
+
+def _early_closes(year: int, holidays: dict) -> dict:
+    candidates = [
+        date(year, 7, 3),  # Independence Day eve
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),  # Day after Thanksgiving
+        date(year, 12, 24),  # Christmas Eve
+    ]
+    return {day: EARLY_CLOSE for day in candidates if day.weekday() < 5 and day not in holidays}
+
+
+HOLIDAYS = {}
+EARLY_CLOSES = {}
+for _year in range(FIRST_YEAR, LAST_YEAR + 1):
+    _year_holidays = _holidays(_year)
+    HOLIDAYS.update(_year_holidays)
+    EARLY_CLOSES.update(_early_closes(_year, _year_holidays))
+HOLIDAYS.update(SPECIAL_CLOSURES)
+
+
+def holiday_name(day: date):
+    """Name of the holiday the exchange is closed for on day, None if it isn't a holiday."""
+    return HOLIDAYS.get(day)
+
+
+def is_trading_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in HOLIDAYS
+
+
+def market_open(day: date):
+    """Session open on day, None when the exchange is closed."""
+    return MARKET_OPEN if is_trading_day(day) else None
+
+
+def market_close(day: date):
+    """Session close on day (13:00 on half days), None when the exchange is closed."""
+    if not is_trading_day(day):
+        return None
+    return EARLY_CLOSES.get(day, MARKET_CLOSE)
+
+
+def next_trading_day(day: date) -> date:
+    """First trading day after day."""
+    day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return day
+
+
+def previous_trading_day(day: date) -> date:
+    """Last trading day before day."""
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def last_session(now: datetime) -> date:
+    """Trading day of the last session that has started by now (exchange time), pre-market included.
+    Before 4:00 on a trading day that is still the previous one, that's what the latest bars belong to."""
+    day = now.date()
+    if is_trading_day(day) and now.time() >= PREMARKET_OPEN:
+        return day
+    return previous_trading_day(day)
+
+
+def is_session_open(now: datetime) -> bool:
+    """Whether the regular session is running at now (exchange time)."""
+    close = market_close(now.date())
+    return close is not None and MARKET_OPEN <= now.time() < close